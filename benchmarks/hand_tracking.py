@@ -0,0 +1,60 @@
+# benchmarks/hand_tracking.py
+"""
+Detection cost of HandDetector's default video mode against ROI tracking.
+
+    python -m benchmarks.hand_tracking clip.mp4 [--frames 300] [--width 640]
+
+Runs both modes over the same recorded frames (a webcam clip with one or
+two hands in view) and reports the time per process() call and how many
+hands each mode found. Needs a mediapipe build with the legacy
+mp.solutions API.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.hand_detector import HandDetector
+from src.offline_render import FrameSource
+from src.utils import detection_size
+
+
+def load_frames(path, count, width):
+    source = FrameSource(path)
+    size = detection_size(source.width, source.height, width)
+    frames = []
+    for _, frame, _ in source.frames(0, count):
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(cv2.flip(small, 1), cv2.COLOR_BGR2RGB))
+    return frames
+
+
+def run(detector, frames):
+    times, hands = [], []
+    for rgb in frames:
+        t0 = time.perf_counter()
+        results = detector.process(rgb)
+        times.append(time.perf_counter() - t0)
+        hands.append(len(results.multi_hand_landmarks or []))
+    return np.asarray(times) * 1000.0, np.asarray(hands)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('video', help='video file or image directory')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=640, help='detection width')
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.width)
+    print(f"{len(frames)} frames at {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'mode':<6} {'p50 ms':>7} {'p95 ms':>7} {'mean ms':>8} {'hands/frame':>12}")
+    for label, track in (('video', False), ('roi', True)):
+        ms, hands = run(HandDetector(max_num_hands=2, roi_tracking=track), frames)
+        print(f"{label:<6} {np.percentile(ms, 50):>7.1f} {np.percentile(ms, 95):>7.1f} "
+              f"{ms.mean():>8.1f} {hands.mean():>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+# benchmarks/hot_paths.py
+"""
+Headless benchmarks for the VFX and gesture hot paths.
+
+    python -m benchmarks.hot_paths [--quick] [--output results.json]
+                                   [--baseline benchmarks/baseline.json]
+                                   [--save-baseline] [--tolerance 0.25] [--only frames]
+
+No webcam or window: frames are synthetic and hands are generated
+landmark sequences. Each benchmark reports the min, median and p95 time
+per call in microseconds. Results are written as JSON and compared against
+the stored baseline; anything slower than baseline * (1 + tolerance) is listed
+as a regression and the exit status is 1. --save-baseline replaces the
+baseline with this run (do that on the machine the baseline describes).
+The stored baseline comes from a 1-CPU container (see its environment);
+re-save it on the machine that runs the comparison before trusting it there.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import main as app
+import src.gesture_logic as gestures
+from src.landmarks import HandLandmarks
+from src.sprite_cache import SpriteCache
+from src.vfx_engine import ParticleSystem, VFXEngine
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+FRAME_SIZE = (640, 480)
+ASSETS = {'freeza': app.FREEZA_PNG, 'goku': app.GOKU_PNG, 'naruto': app.NARUTO_PNG}
+
+
+# ---------- synthetic inputs ----------
+
+def synthetic_frame(width, height, seed=0):
+    """Gradient plus noise, like a dim webcam frame."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = np.stack([xx * 200 // width, yy * 200 // height, np.full_like(xx, 90)], axis=2)
+    return np.clip(base + rng.normal(0, 6, base.shape), 0, 255).astype(np.uint8)
+
+
+def hand_pose(extended, cx=0.5, cy=0.5, size=0.2):
+    """
+    (21, 3) landmarks for an upright hand with its finger MCPs at (cx, cy).
+    extended: four bools for index, middle, ring, pinky.
+    """
+    lm = np.zeros((21, 3), dtype=np.float32)
+    lm[0] = (cx, cy + size, 0.0)                     # wrist
+    for i in range(1, 5):                            # thumb, tucked in
+        lm[i] = (cx - 0.3 * size + 0.02 * i, cy + size * (0.8 - 0.1 * i), 0.0)
+    for f, up in enumerate(extended):
+        x = cx + (f - 1.5) * 0.25 * size
+        mcp = 5 + 4 * f
+        lm[mcp] = (x, cy, 0.0)
+        lm[mcp + 1] = (x, cy - 0.3 * size, 0.0)       # pip
+        if up:
+            lm[mcp + 2] = (x, cy - 0.45 * size, 0.0)
+            lm[mcp + 3] = (x, cy - 0.6 * size, 0.0)
+        else:
+            lm[mcp + 2] = (x, cy - 0.15 * size, 0.0)
+            lm[mcp + 3] = (x, cy - 0.05 * size, 0.0)
+    return lm
+
+
+OPEN_PALM = (True, True, True, True)
+ONLY_INDEX = (True, False, False, False)
+
+
+def hand_sequence(poses, frames, seed=0, jitter=0.004, drift=0.002):
+    """
+    frames lists of HandLandmarks: each pose in poses drifts sideways
+    and jitters a little from frame to frame, like tracked landmarks.
+    """
+    rng = np.random.default_rng(seed)
+    sequence = []
+    for t in range(frames):
+        hands = []
+        for pose in poses:
+            lm = pose.copy()
+            lm[:, 0] += drift * np.sin(t / 10.0)
+            lm[:, :2] += rng.normal(0, jitter, (21, 2)).astype(np.float32)
+            hands.append(HandLandmarks(lm))
+        sequence.append(hands)
+    return sequence
+
+
+# ---------- timing ----------
+
+def measure(fn, repeat, number=1, setup=None):
+    """Per-call seconds for repeat rounds of number calls each."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return samples
+
+
+def summarize(samples):
+    us = np.asarray(samples) * 1e6
+    return {'min_us': float(us.min()), 'median_us': float(np.median(us)),
+            'p95_us': float(np.percentile(us, 95)), 'samples': len(us)}
+
+
+class Suite:
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.results = {}
+
+    def run(self, name, fn, repeat, number=1, setup=None):
+        if self.quick:
+            repeat = max(3, repeat // 4)
+        self.results[name] = summarize(measure(fn, repeat, number, setup))
+        r = self.results[name]
+        print(f"  {name:<44} {r['median_us']:>11.1f} us  (p95 {r['p95_us']:.1f})")
+
+
+# ---------- benchmarks ----------
+
+def bench_assets(suite):
+    print("assets")
+    for name, path in ASSETS.items():
+        engine = VFXEngine()
+        suite.run(f"load_png/{name}/cold", lambda: engine.load_png(path), 10,
+                  setup=engine.cache.clear)
+        suite.run(f"load_png/{name}/cached", lambda: engine.load_png(path), 20, number=1000)
+
+    engine = VFXEngine()
+    png = engine.load_png(ASSETS['naruto'])
+    suite.run("pregenerate_rotations/naruto/72", lambda: engine.pregenerate_rotations(png, 72), 3)
+    rotations = engine.pregenerate_rotations(png, 72)
+    angles = itertools.cycle(np.random.default_rng(0).uniform(0, 360, 4096).tolist())
+    suite.run("get_prerotated/dict", lambda: engine.get_prerotated(rotations, next(angles)),
+              20, number=1000)
+    rotation_set = engine.rotation_set(png, 72, working_scale=0.25)
+    for step in range(72):
+        rotation_set.get(step * 5)
+    suite.run("get_prerotated/rotation_set", lambda: engine.get_prerotated(rotation_set, next(angles)),
+              20, number=1000)
+
+
+def bench_overlay(suite):
+    print("overlay_png")
+    engine = VFXEngine()
+    w, h = FRAME_SIZE
+    frame = synthetic_frame(w, h)
+    png = engine.load_png(ASSETS['freeza'])
+    prepared = engine.prepare_sprite(png)
+    placements = {
+        'center': (w // 2, h // 2),
+        'edge': (w - 20, h // 2),        # most of the sprite clipped off the right
+        'corner': (0, 0),                # three quarters clipped
+        'offscreen': (w + 500, h + 500),
+    }
+    for scale in (0.25, 0.5, 1.0):
+        for where, center in placements.items():
+            target = frame.copy()
+            suite.run(f"overlay_png/bgra/x{scale}/{where}",
+                      lambda: engine.overlay_png(target, png, center, scale), 10, number=20)
+        target = frame.copy()
+        suite.run(f"overlay_png/prepared/x{scale}/center",
+                  lambda: engine.overlay_png(target, prepared, placements['center'], scale), 10, number=20)
+
+    # A stamped 8-sprite trail (the old beam, cached sprites) against particle beams
+    sprites = SpriteCache()
+    sprites.add_asset('freeza', png, steps=72)
+    trail = [(sprites.get('freeza', 0, 0.2 * (1.0 - i * 0.05)), (160 + 40 * i, 360 - 25 * i),
+              1.0, 1.0 - i * 0.1, i) for i in range(8)]
+    target = frame.copy()
+    suite.run("overlay_batch/trail_8", lambda: engine.overlay_batch(target, trail), 10, number=20)
+    rng = np.random.default_rng(0)
+    for count in (100, 300, 1000):
+        particles = ParticleSystem(count)
+        along = rng.uniform(0.0, 1.0, (count, 1))
+        particles.emit(np.float32((160, 360)) + along * (320, -200), rng.normal(0, 50, (count, 2)),
+                       rng.uniform(0.3, 0.6, count), rng.uniform(2.0, 6.0, count), (255, 90, 200))
+        target = frame.copy()
+        suite.run(f"particles/draw/{count}", lambda: particles.draw(target), 10, number=20)
+        clock = itertools.count()
+        suite.run(f"particles/step/{count}", lambda: particles.step(next(clock) * 1e-6), 10, number=200)
+
+
+def bench_gestures(suite):
+    print("gesture_logic")
+    w, h = FRAME_SIZE
+    one = hand_sequence([hand_pose(ONLY_INDEX)], 1000)
+    two = hand_sequence([hand_pose(OPEN_PALM, 0.4, 0.2), hand_pose(OPEN_PALM, 0.6, 0.2)], 1000)
+    hands = itertools.cycle([seq[0] for seq in one])
+
+    predicates = {
+        'is_index_finger_up': gestures.is_index_finger_up,
+        'is_only_index_finger_up': gestures.is_only_index_finger_up,
+        'is_open_palm': gestures.is_open_palm,
+        'is_fist': gestures.is_fist,
+        'is_peace_sign': gestures.is_peace_sign,
+        'is_thumb_up': gestures.is_thumb_up,
+    }
+    for name, predicate in predicates.items():
+        suite.run(f"gesture/{name}", lambda: predicate(next(hands)), 20, number=500)
+    suite.run("gesture/get_fingertip_pixel",
+              lambda: gestures.get_fingertip_pixel(next(hands), w, h), 20, number=500)
+    suite.run("gesture/get_palm_center_pixel",
+              lambda: gestures.get_palm_center_pixel(next(hands), w, h), 20, number=500)
+    suite.run("gesture/is_goku_pose",
+              lambda: gestures.is_goku_pose((250, 90), (380, 95), w, h), 20, number=500)
+    pairs = itertools.cycle(two)
+    suite.run("gesture/classify_all/1_hand",
+              lambda: gestures.classify_all([next(hands)], frame_w=w, frame_h=h), 20, number=500)
+    suite.run("gesture/classify_all/2_hands",
+              lambda: gestures.classify_all(next(pairs), frame_w=w, frame_h=h), 20, number=500)
+
+
+def bench_frames(suite):
+    """One frame of main.apply_effects per call, for each effect phase."""
+    print("main.apply_effects")
+    engine = VFXEngine()
+    sprites = SpriteCache(max_bytes=app.SPRITE_CACHE_BYTES)
+    for name, path in ASSETS.items():
+        sprites.add_asset(name, engine.load_png(path), steps=72)
+    w, h = FRAME_SIZE
+    base = synthetic_frame(w, h)
+
+    scenarios = {
+        # name: (hand poses, effect whose charge to release, or None)
+        'rasengan': ([hand_pose(OPEN_PALM, 0.5, 0.5)], None),
+        'freeza_charging': ([hand_pose(ONLY_INDEX, 0.4, 0.5)], None),
+        'freeza_release': ([hand_pose(ONLY_INDEX, 0.4, 0.5)], 'freeza'),
+        'spirit_bomb_charging': ([hand_pose(OPEN_PALM, 0.4, 0.1), hand_pose(OPEN_PALM, 0.6, 0.1)], None),
+        'spirit_bomb_release': ([hand_pose(OPEN_PALM, 0.4, 0.1), hand_pose(OPEN_PALM, 0.6, 0.1)], 'goku'),
+    }
+    number = 10  # keeps each round inside the shortest release (1.5 s)
+    for name, (poses, release) in scenarios.items():
+        sequence = hand_sequence(poses, 5 + number)
+        frames = iter([])
+        states = None
+
+        def setup():
+            # Gesture stabilizers need a few frames; charges then run on real
+            # time, so every round restarts them (releases last 1.5-2 s)
+            nonlocal frames, states
+            states = app.new_effect_states()
+            for hands in sequence[:5]:
+                app.apply_effects(base.copy(), hands, engine, sprites, states=states)
+            if release:
+                app.release_charge(states, release)
+            frames = iter(sequence[5:])
+
+        suite.run(f"frame/{name}",
+                  lambda: app.apply_effects(base.copy(), next(frames), engine, sprites, states=states),
+                  15, number=number, setup=setup)
+
+
+# ---------- results ----------
+
+def calibrate(rounds=15):
+    """
+    Min time of a fixed NumPy + OpenCV + Python workload, in microseconds.
+    Comparisons divide by it, so a slower or busier machine does not read
+    as a regression.
+    """
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+
+    def workload():
+        b = cv2.GaussianBlur(a, (5, 5), 0)
+        (a.astype(np.uint16) * b).sum()
+        sum(i * i for i in range(2000))
+
+    return float(min(measure(workload, rounds, number=5))) * 1e6
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance, speed=1.0, min_delta_us=5.0):
+    """
+    Names slower than baseline * (1 + tolerance), with their ratios.
+    Compares the fastest round: it is the least disturbed by other load.
+    speed: this machine's calibration time over the baseline's.
+    Slowdowns under min_delta_us are timer noise on sub-microsecond calls.
+    """
+    regressions = []
+    print(f"\n{'benchmark (min per call)':<46} {'baseline us':>12} {'now us':>10} {'ratio':>7}  (speed-adjusted)")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<46} {'-':>12} {result['min_us']:>10.1f}   (new)")
+            continue
+        expected = old['min_us'] * speed
+        ratio = result['min_us'] / max(expected, 1e-9)
+        flag = ''
+        if ratio > 1.0 + tolerance and result['min_us'] - expected > min_delta_us:
+            regressions.append((name, ratio))
+            flag = '  REGRESSION'
+        print(f"{name:<46} {old['min_us']:>12.1f} {result['min_us']:>10.1f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help='fewer rounds per benchmark')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown over baseline before flagging (0.25 = 25%%)')
+    parser.add_argument('--min-delta-us', type=float, default=5.0,
+                        help='ignore slowdowns smaller than this many microseconds')
+    parser.add_argument('--only', default='', help='run benchmarks whose group starts with this')
+    args = parser.parse_args()
+
+    calibration_us = calibrate()
+    suite = Suite(quick=args.quick)
+    groups = {'assets': bench_assets, 'overlay': bench_overlay,
+              'gestures': bench_gestures, 'frames': bench_frames}
+    for group, bench in groups.items():
+        if group.startswith(args.only):
+            bench(suite)
+
+    report = {'environment': environment(), 'calibration_us': calibration_us,
+              'results': suite.results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != report['environment']:
+        print("Note: baseline was recorded on a different environment:",
+              baseline.get('environment'))
+    speed = calibration_us / baseline.get('calibration_us', calibration_us)
+    print(f"Calibration: {calibration_us:.0f} us ({speed:.2f}x the baseline machine's time)")
+    regressions = compare(suite.results, baseline['results'], args.tolerance, speed,
+                          args.min_delta_us)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}:")
+        for name, ratio in regressions:
+            print(f"  {name}: {ratio:.2f}x")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
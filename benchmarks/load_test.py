@@ -0,0 +1,290 @@
+# benchmarks/load_test.py
+"""
+Load generator for the web_app Socket.IO server.
+
+    python -m benchmarks.load_test [--url http://localhost:5000] [--clients 1,5,10,25,50]
+                                   [--rate 30] [--duration 10] [--protocol binary]
+                                   [--scenario mixed] [--recording hands.npz]
+                                   [--procs 2] [--deadline-ms 100] [--output load.json]
+
+Start the server first (python web_app.py). For each client count N, N
+simulated desktop clients connect, say 'hello' the way templates/index.html
+does and stream landmark frames at --rate per second for --duration
+seconds. Every frame carries a seq that the server echoes in its reply, so
+each reply is timed against the frame it answers. Frames that get no reply
+(superseded in the server's latest-wins queue, or never answered) count as
+dropped; replies slower than --deadline-ms count as late.
+
+Scenarios: open_palm (Rasengan), index (Freeza Beam), two_hands (Spirit
+Bomb) and mixed (all three plus empty frames, each client at its own
+offset). --recording replays real landmarks instead: an .npz holding one
+(hands, 21, 3) array per frame, as written by np.savez(path, *frames) from
+offline_render.detect_chunk output.
+
+The capacity line is the largest N that stayed under --max-drop and kept
+p95 latency under the deadline, per server core. The generator itself uses
+CPU: if it runs on the server's machine, its lag column shows when it,
+not the server, is what fell behind.
+
+Needs the Socket.IO client extras: pip install "python-socketio[client]".
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import numpy as np
+import socketio
+
+from benchmarks.hot_paths import ONLY_INDEX, OPEN_PALM, hand_pose, hand_sequence
+from src.wire_protocol import (
+    PROTOCOL_BINARY, PROTOCOL_JSON, encode_frame, json_frame, reply_seq
+)
+
+FRAME_SIZE = (640, 480)
+SCENARIOS = ('open_palm', 'index', 'two_hands', 'mixed')
+
+
+# ---------- landmark sequences ----------
+
+def scenario_frames(name, frames=300, seed=0):
+    """List of (hands, 21, 3) float32 arrays for one scenario."""
+    poses = {
+        'open_palm': [hand_pose(OPEN_PALM, 0.5, 0.5)],
+        'index': [hand_pose(ONLY_INDEX, 0.5, 0.5)],
+        'two_hands': [hand_pose(OPEN_PALM, 0.35, 0.15, 0.1), hand_pose(OPEN_PALM, 0.65, 0.15, 0.1)],
+    }
+    if name == 'mixed':
+        parts = [('open_palm', 60), ('index', 60), ('two_hands', 90)]
+        out = []
+        for part, count in parts:
+            out += scenario_frames(part, count, seed)
+        return out + [np.empty((0, 21, 3), dtype=np.float32)] * 30
+    return [np.stack([hand.array for hand in hands])
+            for hands in hand_sequence(poses[name], frames, seed)]
+
+
+def load_recording(path):
+    data = np.load(path)
+    return [data[f'arr_{i}'].astype(np.float32) for i in range(len(data.files))]
+
+
+# ---------- simulated clients ----------
+
+class SimClient:
+    """One desktop client: streams frames and times the replies by seq."""
+    def __init__(self, url, frames, offset, binary):
+        self.url = url
+        self.frames = frames
+        self.index = offset
+        self.binary = binary
+        self.protocol = PROTOCOL_JSON
+        self.seq = 0
+        self.sent = 0
+        self.sent_at = {}      # seq -> send time; binary seqs wrap at 256
+        self.latencies = []
+        self.unmatched = 0
+        self.errors = 0
+        self._welcome = threading.Event()
+
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('welcome', self._on_welcome)
+        self.sio.on('processed_frame', lambda data: self._on_reply(data.get('seq')))
+        self.sio.on('processed_frame_bin', lambda data: self._on_reply(reply_seq(data)))
+        self.sio.on('error', self._on_error)
+
+    def _on_welcome(self, data):
+        self.protocol = data.get('protocol', PROTOCOL_JSON)
+        self._welcome.set()
+
+    def _on_error(self, data):
+        self.errors += 1
+
+    def _on_reply(self, seq):
+        t = self.sent_at.pop(seq, None)
+        if t is None:
+            self.unmatched += 1
+            return
+        self.latencies.append(time.perf_counter() - t)
+
+    def connect(self, timeout=5.0):
+        self.sio.connect(self.url, transports=['websocket'], wait_timeout=timeout)
+        offered = [PROTOCOL_BINARY, PROTOCOL_JSON] if self.binary else [PROTOCOL_JSON]
+        self.sio.emit('hello', {'protocols': offered, 'events': False})
+        self._welcome.wait(timeout)
+
+    def send(self):
+        landmarks = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        self.seq += 1
+        width, height = FRAME_SIZE
+        if self.protocol == PROTOCOL_BINARY:
+            key = self.seq & 0xFF
+            self.sent_at[key] = time.perf_counter()
+            self.sio.emit('process_frame_bin', encode_frame(landmarks, width, height, seq=key))
+        else:
+            payload = json_frame(landmarks, width, height)
+            payload['seq'] = self.seq
+            self.sent_at[self.seq] = time.perf_counter()
+            self.sio.emit('process_frame', payload)
+        self.sent += 1
+
+    def disconnect(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def _client_proc(url, clients, frames, rate, duration, drain, binary, barrier, results):
+    """
+    One generator process: connects its share of clients, waits for the
+    others, then sends round-robin so sends are spread evenly over each
+    1/rate interval.
+    """
+    sims, failed = [], 0
+    for index, offset in clients:
+        sim = SimClient(url, frames, offset, binary)
+        try:
+            sim.connect()
+            sims.append(sim)
+        except Exception:
+            failed += 1
+    barrier.wait()
+
+    lag = 0.0
+    if sims:
+        slot_time = 1.0 / rate / len(sims)
+        start = time.perf_counter()
+        end = start + duration
+        slot = 0
+        while True:
+            due = start + slot * slot_time
+            if due >= end:
+                break
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            else:
+                lag = max(lag, now - due)
+            try:
+                sims[slot % len(sims)].send()
+            except Exception:
+                sims[slot % len(sims)].errors += 1
+            slot += 1
+        time.sleep(drain)
+
+    for sim in sims:
+        sim.disconnect()
+    results.put({
+        'connected': len(sims),
+        'failed': failed,
+        'sent': sum(s.sent for s in sims),
+        'latencies': [t for s in sims for t in s.latencies],
+        'unmatched': sum(s.unmatched for s in sims),
+        'errors': sum(s.errors for s in sims),
+        'lag': lag,
+    })
+
+
+def run_step(args, n_clients, frames):
+    """Run n_clients for one --duration and return the step's summary dict."""
+    procs = max(1, min(args.procs, n_clients))
+    barrier = mp.Barrier(procs)
+    results = mp.Queue()
+    offsets = [(i, i * 37) for i in range(n_clients)]   # desynchronize the gestures
+    workers = [mp.Process(target=_client_proc,
+                          args=(args.url, offsets[p::procs], frames, args.rate, args.duration,
+                                args.drain, args.protocol == 'binary', barrier, results))
+               for p in range(procs)]
+    for w in workers:
+        w.start()
+    parts = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+
+    latencies = np.array([t for part in parts for t in part['latencies']]) * 1000.0
+    sent = sum(part['sent'] for part in parts)
+    replies = len(latencies)
+    p50, p95, p99 = (np.percentile(latencies, (50, 95, 99)) if replies else (0.0, 0.0, 0.0))
+    return {
+        'clients': n_clients,
+        'connected': sum(part['connected'] for part in parts),
+        'failed': sum(part['failed'] for part in parts),
+        'offered_fps': sent / args.duration,
+        'reply_fps': replies / args.duration,
+        'sent': sent,
+        'replies': replies,
+        'dropped': sent - replies,
+        'late': int(np.count_nonzero(latencies > args.deadline_ms)),
+        'errors': sum(part['errors'] for part in parts),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'generator_lag_ms': max(part['lag'] for part in parts) * 1000.0,
+    }
+
+
+def within_budget(step, args):
+    if not step['sent'] or step['failed']:
+        return False
+    return step['dropped'] / step['sent'] <= args.max_drop and step['p95_ms'] <= args.deadline_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', default='1,5,10,25,50',
+                        help='comma-separated client counts to ramp through')
+    parser.add_argument('--rate', type=float, default=30.0, help='frames/s per client')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per step')
+    parser.add_argument('--drain', type=float, default=1.0,
+                        help='seconds to wait for replies after the last send')
+    parser.add_argument('--protocol', choices=('binary', 'json'), default='binary')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='mixed')
+    parser.add_argument('--recording', help='.npz of per-frame landmark arrays to replay')
+    parser.add_argument('--procs', type=int, default=min(4, os.cpu_count() or 1),
+                        help='generator processes')
+    parser.add_argument('--deadline-ms', type=float, default=100.0)
+    parser.add_argument('--max-drop', type=float, default=0.05,
+                        help='dropped fraction still counted as keeping up')
+    parser.add_argument('--server-cores', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='write the steps as JSON')
+    args = parser.parse_args()
+
+    frames = load_recording(args.recording) if args.recording else scenario_frames(args.scenario)
+    source = args.recording or args.scenario
+    print(f"{args.url} | {source} | {args.protocol} | {args.rate:g} fps per client | "
+          f"{args.duration:g}s per step | deadline {args.deadline_ms:g} ms")
+    print(f"{'clients':>7} {'offered/s':>10} {'replies/s':>10} {'dropped':>8} {'late':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag ms':>8}")
+
+    steps = []
+    for n_clients in (int(n) for n in args.clients.split(',')):
+        step = run_step(args, n_clients, frames)
+        steps.append(step)
+        failed = f"  ({step['failed']} failed to connect)" if step['failed'] else ""
+        print(f"{n_clients:>7} {step['offered_fps']:>10.0f} {step['reply_fps']:>10.0f} "
+              f"{step['dropped']:>8} {step['late']:>6} {step['p50_ms']:>8.1f} "
+              f"{step['p95_ms']:>8.1f} {step['p99_ms']:>8.1f} {step['generator_lag_ms']:>8.1f}{failed}")
+
+    passing = [step for step in steps if within_budget(step, args)]
+    if passing:
+        best = max(passing, key=lambda step: step['clients'])
+        print(f"\nCapacity: {best['clients']} clients at {args.rate:g} fps "
+              f"({best['clients'] / args.server_cores:.1f} clients, "
+              f"{best['reply_fps'] / args.server_cores:.0f} frames/s per core, "
+              f"{args.server_cores} server cores)")
+    else:
+        print("\nCapacity: no step stayed within the drop and latency budget")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'steps': steps}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/render_pool.py
+"""
+Throughput of the mobile server-side render mode.
+
+    python -m benchmarks.render_pool [--frames 200] [--workers 1 2 4]
+
+Each frame is one render_frame job as web_app runs it: JPEG decode,
+composite of a cached effect sprite, JPEG encode. As in the server, jobs go
+through eventlet's tpool (tpool.execute on a pool of `workers` OS threads)
+and are submitted from as many green threads as there are workers;
+throughput is reported in total and per core (workers beyond the core count
+cannot add any).
+"""
+import argparse
+import os
+import time
+
+import cv2
+import eventlet
+import numpy as np
+from eventlet import tpool
+
+from src.render_pool import RenderPool, render_frame
+from src.sprite_cache import SpriteCache
+from src.vfx_engine import VFXEngine
+
+SIZES = {'phone': (390, 844), '720p': (1280, 720)}
+ASSET = ("assets/vfx/naruto/n1.png", 72, 0.25)
+
+
+def synthetic_jpeg(width, height, quality=70):
+    """Smooth gradient plus sensor-like noise, so JPEG sizes are camera-like."""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = np.stack([xx * 255 // width, yy * 255 // height, (xx + yy) * 255 // (width + height)], axis=2)
+    frame = np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def run_pool(pool, job, frames, clients):
+    per_client = frames // clients
+
+    def client():
+        for _ in range(per_client):
+            pool.run(*job)
+
+    t0 = time.perf_counter()
+    greenlets = [eventlet.spawn(client) for _ in range(clients)]
+    for g in greenlets:
+        g.wait()
+    return per_client * clients / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    vfx = VFXEngine()
+    path, steps, _ = ASSET
+    sprites = SpriteCache()
+    sprites.add_asset('naruto', vfx.load_png(path), steps=steps)
+    sprite = sprites.get('naruto', 45, 0.25)
+
+    print(f"{cores} core(s)")
+    print(f"{'size':<6} {'workers':>7} {'fps':>8} {'fps/core':>9} {'p50 ms':>7} {'p99 ms':>7}")
+    for label, (w, h) in SIZES.items():
+        jpeg = synthetic_jpeg(w, h)
+        job = (render_frame, vfx, jpeg, sprite, (w // 2, h // 2), 1.0)
+        for workers in args.workers:
+            tpool.killall()   # tpool only sizes its threads when it starts them
+            tpool.set_num_threads(workers)
+            pool = RenderPool(workers, execute=tpool.execute)
+            fps = run_pool(pool, job, args.frames, workers)
+            s = pool.stats()
+            print(f"{label:<6} {workers:>7} {fps:>8.1f} {fps / min(workers, cores):>9.1f} "
+                  f"{s['p50_ms']:>7.1f} {s['p99_ms']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/session_store.py
+"""
+Throughput of the web_app session stores.
+
+    python -m benchmarks.session_store [--sessions 500] [--ops 200000] [--procs 4]
+
+Each op is one handle_frame's worth of store traffic: get, mutate, save.
+The shared memory store is also run from several processes at once, each
+owning its own sids as Socket.IO workers would.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+from src.session_store import LocalSessionStore, SharedMemorySessionStore
+
+
+def run_ops(store, sids, ops):
+    t0 = time.perf_counter()
+    n = len(sids)
+    for i in range(ops):
+        sid = sids[i % n]
+        state = store.get(sid)
+        state.goku_angle = (state.goku_angle + 12) % 360
+        state.charge_level = min(1.0, state.charge_level + 0.01)
+        store.save(sid, state)
+    return ops / (time.perf_counter() - t0)
+
+
+def bench_store(label, store, sessions, ops, prefix='s'):
+    sids = [f"{prefix}{i:019d}" for i in range(sessions)]  # Socket.IO sids are 20 chars
+    t0 = time.perf_counter()
+    for sid in sids:
+        store.create(sid)
+    create_rate = sessions / (time.perf_counter() - t0)
+    op_rate = run_ops(store, sids, ops)
+    t0 = time.perf_counter()
+    for sid in sids:
+        store.delete(sid)
+    delete_rate = sessions / (time.perf_counter() - t0)
+    print(f"{label:<28} create {create_rate:>10,.0f}/s | get+save {op_rate:>10,.0f}/s | "
+          f"delete {delete_rate:>10,.0f}/s")
+    return op_rate
+
+
+def _worker(name, worker_id, sessions, ops, results):
+    store = SharedMemorySessionStore(name)
+    sids = [f"w{worker_id}-{i:017d}" for i in range(sessions)]
+    for sid in sids:
+        store.create(sid)
+    results.put(run_ops(store, sids, ops))
+    for sid in sids:
+        store.delete(sid)
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--procs", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions, {args.ops} get+save ops per run")
+    bench_store("local (dict)", LocalSessionStore(), args.sessions, args.ops)
+
+    name = f"acs_bench_{os.getpid()}"
+    store = SharedMemorySessionStore(name, capacity=max(4096, 2 * args.sessions * args.procs))
+    bench_store("shared memory, 1 process", store, args.sessions, args.ops)
+
+    results = mp.Queue()
+    procs = [mp.Process(target=_worker, args=(name, i, args.sessions, args.ops, results))
+             for i in range(args.procs)]
+    for p in procs:
+        p.start()
+    rates = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    print(f"{f'shared memory, {args.procs} procs':<28} get+save "
+          f"{sum(rates):>10,.0f}/s total ({min(rates):,.0f}-{max(rates):,.0f}/s per process)")
+
+    store.close()   # the last process to detach unlinks the segment
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/wire_protocol.py
+"""
+Size and decode cost of the process_frame wire formats.
+
+    python -m benchmarks.wire_protocol [--iters 20000]
+
+Compares the JSON protocol (what the templates send by default) with the
+binary uint16 and float32 layouts for one and two hands, plus the
+processed_frame reply in both forms. Decode time is the server side only:
+json.loads + hands_to_array against decode_frame.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.wire_protocol import (
+    FORMAT_F32, FORMAT_U16, decode_frame, encode_frame, encode_reply,
+    hands_to_array, json_frame, json_size
+)
+
+
+def time_us(fn, iters):
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) / iters * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iters', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'hands':>5} {'format':<8} {'bytes':>7} {'decode us':>10}")
+    for n_hands in (1, 2):
+        landmarks = rng.random((n_hands, 21, 3)).astype(np.float32)
+        landmarks[:, :, 2] -= 0.5
+        text = json.dumps(json_frame(landmarks, 1280, 720), separators=(',', ':'))
+
+        def decode_json():
+            data = json.loads(text)
+            return hands_to_array(data['hands']), data['width'], data['height']
+
+        rows = [('json', len(text.encode()), time_us(decode_json, args.iters))]
+        for label, fmt in (('u16', FORMAT_U16), ('f32', FORMAT_F32)):
+            payload = encode_frame(landmarks, 1280, 720, fmt)
+            rows.append((label, len(payload), time_us(lambda: decode_frame(payload), args.iters)))
+        for label, size, us in rows:
+            print(f"{n_hands:>5} {label:<8} {size:>7} {us:>10.2f}")
+
+    reply = {'vfx_data': {'type': 'goku', 'angle': 132.0, 'position': {'x': 640, 'y': 180},
+                          'scale': 1.2, 'charge_level': 0.42},
+             'effect': 'Spirit Bomb'}
+    print(f"\nreply bytes: json {json_size(reply)} | binary {len(encode_reply(reply))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,309 +1,353 @@
 # main.py
 import cv2
-import numpy as np
 from src.hand_detector import HandDetector
 import src.gesture_logic as gestures
 from src.vfx_engine import VFXEngine
-from src.utils import put_text, get_grid_position
-from src.gesture_logic import GestureState, ChargeState
+from src.sprite_cache import SpriteCache
+from src.utils import put_text
+from src.effect_registry import EffectRegistry
+from src.desktop_effects import EffectFrame, Rasengan, FreezaBeam, SpiritBomb
+from src.pipeline import CapturePipeline, LatencyStats
+from src.frame_ring import FrameRing, AllocationCounter, MIRROR_MODES
+from src.quality_governor import QualityGovernor, TIER_NAMES, tier_by_name
+from src.multi_stream import StreamRunner, stream_worker
+from src.detection_scheduler import DetectionScheduler, LandmarkPredictor
+from src.stage_timer import StageTimers
+from src.offline_render import FrameSource, NullCompositor, render_offline
+from src.asset_bundle import open_bundle
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import argparse
+import os
 import time
-import math
 
-freeza_state = GestureState(on_frames=3, off_frames=5)
-freeza_charge = ChargeState(max_charge_time=6.0, release_duration=1.5)
-goku_state  = GestureState(on_frames=3, off_frames=5)
-goku_charge = ChargeState(max_charge_time=10.0, release_duration=2.0)
-rasengan_state = GestureState(on_frames=3, off_frames=5)
+# Effects in priority order per hand count; the tuning lives here
+EFFECTS = EffectRegistry([
+    Rasengan(priority=0),
+    FreezaBeam(priority=1, max_charge_time=6.0, release_duration=1.5),
+    SpiritBomb(max_charge_time=10.0, release_duration=2.0),
+])
+effect_state = EFFECTS.new_states()
+
+
+def new_effect_states():
+    """Fresh states for apply_effects(states=...), apart from the module-level ones."""
+    return EFFECTS.new_states()
+
+
+def release_charge(states, name):
+    """Start releasing a charged effect's charge now, whatever its level."""
+    states[name].charge.trigger_release()
+
 
 FREEZA_PNG = "assets/vfx/freeza/f1.png"
 GOKU_PNG   = "assets/vfx/goku/g1.png"
 NARUTO_PNG = "assets/vfx/naruto/n1.png"
 
-# Performance settings
-DETECTION_WIDTH = 640   # MediaPipe processes at lower res
-DETECTION_HEIGHT = 360
-SKIP_FRAMES = 2         # Process MediaPipe every Nth frame
+# Performance settings (the live loop's come from its quality tier, see src/quality_governor.py)
+DETECTION_WIDTH = 640   # MediaPipe processes at lower res (height follows the camera aspect)
+TARGET_FPS = 30         # Detection is spaced out to keep frames inside this budget
+MIN_DETECTION_HZ = 10   # ...but never runs less often than this
+QUALITY_START = 'high'  # --quality auto starts here
+SPRITE_CACHE_BYTES = 64 * 1024 * 1024  # Sized/rotated sprites kept ready to blend
+
+# Per-stage frame timing; enabled by --hud / --metrics-file
+timers = StageTimers(enabled=False)
+
+
+def serial_frames(cap, detector, ring, allocs=None, scheduler=None):
+    """
+    Capture, detect and yield (frame, hands, t_capture) on the calling thread.
+    The scheduler decides which frames run MediaPipe; on the others the
+    landmarks are extrapolated from the last detections. Every image lives
+    in ring's preallocated slots; allocs (AllocationCounter) measures the
+    capture and detection-input steps when enabled.
+    """
+    if scheduler is None:
+        scheduler = DetectionScheduler(target_fps=TARGET_FPS, min_hz=MIN_DETECTION_HZ)
+    predictor = LandmarkPredictor()
+    allocs = allocs or AllocationCounter()
+
+    while True:
+        with timers.stage('capture'), allocs.track():
+            slot = ring.read(cap)
+        t_capture = time.perf_counter()
+        if slot is None:
+            continue
+
+        if scheduler.should_detect(t_capture):
+            # Downscale + RGB for detection, into the slot's own buffers
+            with timers.stage('detect_input'), allocs.track():
+                rgb = ring.detection_input(slot)
+            t0 = time.perf_counter()
+            results = detector.process(rgb)
+            inference = time.perf_counter() - t0
+            if timers.enabled:
+                timers.add('detect', inference)
+            scheduler.record(inference, t_capture)
+            predictor.update(ring.landmarks(results.multi_hand_landmarks or []), t_capture)
+
+        with timers.stage('flip'), allocs.track():
+            frame = ring.display(slot)
+        yield frame, predictor.predict(t_capture), t_capture
+        ring.release(slot)
+
+
+def pipelined_frames(cap, detector, ring):
+    """
+    Capture and detection run on their own threads; yield the newest frame
+    paired with the newest landmarks, extrapolated to its capture time.
+    """
+    pipeline = CapturePipeline(cap, detector, ring.detection_width, timers=timers, ring=ring).start()
+    predictor = LandmarkPredictor()
+    last_detection = None
+    try:
+        while True:
+            item = pipeline.next_frame()
+            if item is None:
+                if not pipeline.capturing:
+                    print(f"❌ Capture thread stopped: {pipeline.capture.error!r}")
+                    break
+                continue
+            slot, t_capture = item
+            hands, t_detected = pipeline.latest_hands()
+            if t_detected is not None and t_detected != last_detection:
+                predictor.update(hands, t_detected)
+                last_detection = t_detected
+            yield slot.frame, predictor.predict(t_capture), t_capture
+            ring.release(slot)
+    finally:
+        pipeline.stop()
+        print(f"Pipeline: {pipeline.detection.detections} detections, "
+              f"{pipeline.frames.dropped} frames superseded before display, "
+              f"{ring.dropped} dropped with every slot in use")
+
+
+def apply_effects(frame, hands, vfx, sprites, now=None, states=None):
+    """
+    Run one frame of gesture -> effect logic and composite the result.
+    hands: landmarks for this frame (HandLandmarks / mediapipe hands).
+    now: the frame's time in seconds; defaults to the wall clock. Offline
+    rendering passes frame timestamps so charge and spin follow the video.
+    states: from new_effect_states(); defaults to the module-level effect
+    states. Advances them; returns the frame.
+    """
+    if states is None:
+        states = effect_state
+    if now is None:
+        now = time.time()
+        ticks = cv2.getTickCount()
+    else:
+        ticks = int(now * cv2.getTickFrequency())
+
+    # Only the gestures some effect reads, for every hand in one vectorized pass
+    with timers.stage('gestures'):
+        h, w = frame.shape[:2]
+        masks = gestures.classify_all(hands, margin=0.02, frame_w=w, frame_h=h, wanted=EFFECTS.features)
+        ctx = EffectFrame(frame, hands, masks, now, ticks, sprites, vfx)
+        shown = EFFECTS.dispatch(ctx, states)
+
+    if shown is not None:
+        effect, phase = shown
+        instances = effect.render(ctx, states[effect.name], phase)
+        if instances:
+            with timers.stage('overlay'):
+                frame = vfx.overlay_batch(frame, instances)
+    return frame
+
+
+def apply_quality(tier, ring, scheduler, sprites):
+    """
+    Point the live loop at a QualityTier: camera and detection size (taken
+    up by the ring's next capture), detection cadence, sprite rotation
+    steps and particle density.
+    """
+    ring.reconfigure(tier.capture_size, tier.detection_width)
+    scheduler.set_cadence(tier.detect_share, tier.min_detection_hz)
+    sprites.set_steps(tier.rotation_steps)
+    for effect in EFFECTS.effects.values():
+        if hasattr(effect, 'particle_density'):
+            effect.particle_density = tier.particle_density
+
+
+# SpriteCache name -> asset in src/asset_bundle.py VFX_ASSETS
+BUNDLE_ASSETS = {'freeza': 'freeza', 'goku': 'goku', 'naruto': 'rasengan'}
+
+
+def load_sprites(vfx, bundle=None):
+    """
+    SpriteCache with the three effect assets registered, using the mip
+    pyramids memory-mapped from the asset bundle when one is given.
+    """
+    sprites = SpriteCache(max_bytes=SPRITE_CACHE_BYTES)
+    if bundle is not None:
+        for name, asset in BUNDLE_ASSETS.items():
+            sprites.add_asset(name, steps=72, levels=bundle.mips(asset))
+        return sprites
+    sprites.add_asset('freeza', vfx.load_png(FREEZA_PNG), steps=72)
+    sprites.add_asset('goku', vfx.load_png(GOKU_PNG), steps=72)
+    sprites.add_asset('naruto', vfx.load_png(NARUTO_PNG), steps=72)
+    return sprites
+
+
+def frame_renderer(compositing=True):
+    """
+    render(frame, hands, now=None, states=None) for frames outside the live
+    loop: offline render chunks and --streams workers build one in their
+    process. compositing=False only advances the effect states, for the
+    offline replay pass.
+    """
+    if compositing:
+        vfx = VFXEngine()
+        sprites = load_sprites(vfx, open_bundle(vfx=vfx))
+    else:
+        vfx = sprites = NullCompositor()
+
+    def render(frame, hands, now=None, states=None):
+        return apply_effects(frame, hands, vfx, sprites, now=now, states=states)
+    return render
+
+
+def run_offline(args):
+    """--input: render a video file / image directory (see src/offline_render.py)."""
+    try:
+        source = FrameSource(args.input, args.fps)
+    except ValueError as e:
+        raise SystemExit(f"⚠ {e}")
+    if source.count == 0:
+        raise SystemExit(f"⚠ No frames to render in {args.input}")
+    open_bundle()  # compile once here, not in every render worker
+    output = args.output or os.path.splitext(os.path.basename(args.input.rstrip('/')))[0] + "_animecast.mp4"
+    render_offline(source, output, args.workers, frame_renderer, new_effect_states,
+                   mirror=args.mirror, track=args.track, detection_width=DETECTION_WIDTH)
+
+
+def run_streams(args):
+    """--streams: every source in its own worker process (see src/multi_stream.py)."""
+    worker_kwargs = {'renderer': frame_renderer, 'track': args.track,
+                     'detection_width': DETECTION_WIDTH, 'target_fps': args.target_fps,
+                     'min_detection_hz': MIN_DETECTION_HZ}
+    runner = StreamRunner(args.streams, stream_worker, worker_kwargs,
+                          display=not args.no_window, paced=not args.unpaced,
+                          mirror_files=args.mirror)
+    print(f"⚡ Starting {len(args.streams)} streams on {os.cpu_count() or 1} cores")
+    runner.start(multiprocessing.get_context('spawn'))
+    runner.run()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AnimeCast LIVE")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run capture and hand detection on background threads")
+    parser.add_argument("--track", action="store_true",
+                        help="track each hand in a crop around its last position "
+                             "instead of the whole frame (compare both modes on a clip "
+                             "with python -m benchmarks.hand_tracking)")
+    parser.add_argument("--hud", action="store_true",
+                        help="overlay p50/p95/p99 time per frame stage")
+    parser.add_argument("--metrics-file",
+                        help="write per-stage timings to this file on exit")
+    parser.add_argument("--quality", choices=('auto',) + TIER_NAMES, default="auto",
+                        help="quality tier, or auto to move between tiers to hold --target-fps "
+                             f"(starting at {QUALITY_START})")
+    parser.add_argument("--target-fps", type=float, default=TARGET_FPS,
+                        help="frame rate the quality governor and detection scheduler aim for")
+    parser.add_argument("--mirror-mode", choices=MIRROR_MODES, default="image",
+                        help="mirror the camera image (default), only the landmarks "
+                             "(detection skips the flip), or nothing")
+    parser.add_argument("--debug-alloc", action="store_true",
+                        help="trace allocations on the capture path (serial mode) "
+                             "and report them on exit")
+    streams = parser.add_argument_group("multi-stream")
+    streams.add_argument("--streams", nargs="+", metavar="SOURCE",
+                         help="camera indices and/or video files to run at once, "
+                              "each in its own worker process")
+    streams.add_argument("--no-window", action="store_true",
+                         help="do not show the streams, only report FPS and latency")
+    streams.add_argument("--unpaced", action="store_true",
+                         help="read video files as fast as the workers go instead of at their frame rate")
+    offline = parser.add_argument_group("offline render")
+    offline.add_argument("--input", help="video file or image directory to render instead of the webcam")
+    offline.add_argument("--output", help="output video (default: <input>_animecast.mp4)")
+    offline.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                         help="worker processes (default: one per core)")
+    offline.add_argument("--fps", type=float, default=30.0,
+                         help="frame rate of an image directory (videos use their own)")
+    offline.add_argument("--mirror", action="store_true",
+                         help="flip input frames (and --streams video files) horizontally, "
+                              "as the live view does")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    timers.enabled = bool(args.hud or args.metrics_file)
+    if args.input:
+        run_offline(args)
+        return
+    if args.streams:
+        run_streams(args)
+        return
+
+    # Importing MediaPipe and loading its model is the slowest part of
+    # startup; it runs on a thread while the camera opens and assets load
+    startup = ThreadPoolExecutor(max_workers=1)
+    pending_detector = startup.submit(HandDetector, max_num_hands=2, roi_tracking=args.track)
+
     cap = cv2.VideoCapture(0)
 
     # Camera resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    tier = tier_by_name(QUALITY_START if args.quality == 'auto' else args.quality)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, tier.capture_size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, tier.capture_size[1])
+
+    # Capture, mirror and detection-input images reuse preallocated slots;
+    # the pipelined threads hold more frames at once, so they get more
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or tier.capture_size[0]
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or tier.capture_size[1]
+    ring = FrameRing(width, height, tier.detection_width, slots=5 if args.pipelined else 3,
+                     mirror=args.mirror_mode)
+    # Detection cadence only applies to the serial loop; pipelined detection has its own thread
+    scheduler = DetectionScheduler(target_fps=args.target_fps, detect_share=tier.detect_share,
+                                   min_hz=tier.min_detection_hz)
+    allocs = AllocationCounter(enabled=args.debug_alloc and not args.pipelined).start()
+    if args.debug_alloc and args.pipelined:
+        print("⚠ --debug-alloc measures the serial loop only; ignoring it with --pipelined")
 
-    detector = HandDetector(max_num_hands=2)
     vfx = VFXEngine()
 
-    freeza_png = vfx.load_png(FREEZA_PNG)
-    goku_png   = vfx.load_png(GOKU_PNG)
-    naruto_png = vfx.load_png(NARUTO_PNG)
+    # Rotated + sized sprites are built on first use and then reused
+    print("⚡ Loading sprite mip pyramids...")
+    sprites = load_sprites(vfx, open_bundle(vfx=vfx))
+    print(f"✓ Sprite cache ready! ({sprites.resident_bytes / 1e6:.1f} MB mapped or resident)")
+
+    apply_quality(tier, ring, scheduler, sprites)
+    governor = None
+    if args.quality == 'auto':
+        governor = QualityGovernor(start=tier.name, target_fps=args.target_fps,
+                                   on_change=lambda t: apply_quality(t, ring, scheduler, sprites))
+    print(f"✓ Quality: {tier!r}" + (" (auto)" if governor else ""))
 
-    # Pre-generate rotations for smooth performance
-    print("⚡ Pre-generating rotations...")
-    freeza_rotations = vfx.pregenerate_rotations(freeza_png, steps=72)
-    goku_rotations = vfx.pregenerate_rotations(goku_png, steps=72)
-    naruto_rotations = vfx.pregenerate_rotations(naruto_png, steps=72)
-    print("✓ Rotations cached!")
+    detector = pending_detector.result()
+    startup.shutdown()
 
     show_skeleton = False
-    frame_count = 0
-    
-    # Cached landmarks for frame skipping
-    cached_hands = []
     
     # FPS tracking
     fps_start_time = time.time()
     fps_counter = 0
     current_fps = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        
-        frame = cv2.flip(frame, 1)
-        h, w = frame.shape[:2]
+    # Capture-to-display latency
+    latency = LatencyStats()
 
-        # Process MediaPipe only every SKIP_FRAMES frames
-        if frame_count % SKIP_FRAMES == 0:
-            # Downscale for detection
-            small_frame = cv2.resize(frame, (DETECTION_WIDTH, DETECTION_HEIGHT))
-            rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            results = detector.process(rgb)
-            cached_hands = results.multi_hand_landmarks or []
-        
-        hands = cached_hands
-        frame_count += 1
-
-        active_vfx = None
-        vfx_center = None
-        vfx_scale  = 1.0
-
-        # ========= RASENGAN (Single hand, open palm) =========
-        # Check FIRST to prioritize over Freeza if both conditions met
-        if len(hands) == 1:
-            hand = hands[0]
-            
-            # Check for open palm (all fingers extended)
-            rasengan_active = rasengan_state.update(gestures.is_open_palm(hand, margin=0.02))
-            
-            if rasengan_active:
-                # Position at palm center
-                palm_x, palm_y = gestures.get_palm_center_pixel(hand, w, h)
-                
-                # Calculate palm size for proportional scaling
-                wrist = hand.landmark[0]
-                middle_mcp = hand.landmark[9]
-                palm_size = abs(wrist.y - middle_mcp.y) * h
-                
-                # Scale based on palm size (smaller, more realistic)
-                vfx_scale = max(0.15, min(0.3, palm_size / 180))
-                
-                # Fast spinning rotation for Rasengan
-                angle = (cv2.getTickCount() % 3600) / 5  # Much faster rotation
-                rotated = vfx.get_prerotated(naruto_rotations, angle)
-                
-                vfx_center = (palm_x, palm_y)
-                active_vfx = rotated
-                
-                put_text(frame, "RASENGAN!", (10, 60), color=(100, 150, 255), scale=0.9)
-
-        # ========= FREEZA (Single hand, ONLY index finger up with CHARGE-UP) =========
-        if len(hands) == 1 and active_vfx is None:
-            hand = hands[0]
-
-            # Strict detection: ONLY index finger up, all others down
-            freeza_active = freeza_state.update(gestures.is_only_index_finger_up(hand, margin=0.02))
-            
-            # Update charge state
-            is_charging, is_releasing, charge_level = freeza_charge.update(freeza_active)
-            
-            if freeza_active or is_releasing:
-                # Get fingertip position
-                cx, cy = gestures.get_fingertip_pixel(hand, w, h)
-
-                # Calculate finger size for base scaling
-                tip = hand.landmark[8]
-                pip = hand.landmark[6]
-                finger_length = abs(tip.y - pip.y) * h
-                base_scale = max(0.15, min(0.35, finger_length / 200))
-                
-                # Calculate pointing direction (from wrist to fingertip)
-                wrist = hand.landmark[0]
-                wrist_x, wrist_y = int(wrist.x * w), int(wrist.y * h)
-                dx = cx - wrist_x
-                dy = cy - wrist_y
-                angle_rad = math.atan2(dy, dx)
-                
-                # CHARGING: Reduce size for accuracy
-                if is_charging:
-                    # Size reduces as charge increases (more focused)
-                    charge_reduction = 1.0 - (charge_level * 0.4)  # Reduces to 60% size
-                    pulse = 1.0 + (0.08 * math.sin(time.time() * 10))  # Fast pulse
-                    vfx_scale = base_scale * charge_reduction * pulse
-                    
-                    # Rotation slows down while charging (focusing energy)
-                    rotation_angle = (cv2.getTickCount() % 3600) / (20 + charge_level * 30)
-                    rotated = vfx.get_prerotated(freeza_rotations, rotation_angle)
-                    
-                    vfx_center = (cx, cy)
-                    active_vfx = rotated
-                    
-                    # Display charge status
-                    charge_percent = int(charge_level * 100)
-                    put_text(frame, f"Charging Beam... {charge_percent}%", (10, 60), color=(200, 100, 255), scale=0.8)
-                    
-                    # Small charge indicator near fingertip
-                    indicator_radius = int(5 + charge_level * 10)
-                    cv2.circle(frame, (cx, cy), indicator_radius, (200, 100, 255), 2)
-                
-                # RELEASING: Fire beam in pointed direction
-                elif is_releasing:
-                    release_progress = freeza_charge.get_release_progress()
-                    
-                    # Beam shoots out in the direction you were pointing
-                    beam_distance = release_progress * w * 0.8  # Travels 80% of screen width
-                    beam_x = cx + int(beam_distance * math.cos(angle_rad))
-                    beam_y = cy + int(beam_distance * math.sin(angle_rad))
-                    
-                    # Beam stays small and focused
-                    release_scale = base_scale * 0.6  # Compact beam
-                    
-                    # Fast rotation during fire
-                    rotation_angle = (cv2.getTickCount() % 3600) / 5
-                    rotated = vfx.get_prerotated(freeza_rotations, rotation_angle)
-                    
-                    # Draw beam trail from finger to current position
-                    for i in range(8):
-                        trail_progress = release_progress * (i / 8.0)
-                        trail_x = cx + int(beam_distance * trail_progress * math.cos(angle_rad))
-                        trail_y = cy + int(beam_distance * trail_progress * math.sin(angle_rad))
-                        trail_alpha = 1.0 - (i * 0.1)
-                        trail_scale = release_scale * (1.0 - i * 0.05)
-                        
-                        if 0 <= trail_x < w and 0 <= trail_y < h and trail_alpha > 0:
-                            trail_vfx = (rotated * trail_alpha).astype(np.uint8)
-                            frame = vfx.overlay_png(frame, trail_vfx, (trail_x, trail_y), scale=trail_scale)
-                    
-                    vfx_center = (beam_x, beam_y)
-                    vfx_scale = release_scale
-                    active_vfx = rotated
-                    
-                    put_text(frame, "DEATH BEAM!", (10, 60), color=(255, 100, 200), scale=1.0)
-                
-                # NORMAL: No charge, normal beam
-                else:
-                    vfx_scale = base_scale
-
-                # Use pre-rotated asset instead of rotating every frame
-                angle = (cv2.getTickCount() % 3600) / 20
-                rotated = vfx.get_prerotated(freeza_rotations, angle)
-
-                vfx_center = (cx, cy)
-                active_vfx = rotated
-
-                put_text(frame, "Freeza Beam", (10, 60), color=(200, 100, 255))
-
-        # ========= GOKU (Two hands top row with CHARGE-UP) =========
-        elif len(hands) == 2:
-            # Scale coordinates back to full resolution
-            p0 = gestures.get_palm_center_pixel(hands[0], w, h)
-            p1 = gestures.get_palm_center_pixel(hands[1], w, h)
-
-            r0, _ = get_grid_position(p0[0], p0[1], w, h)
-            r1, _ = get_grid_position(p1[0], p1[1], w, h)
-
-            # Both palms must be in row 0
-            goku_condition = (r0 == 0 and r1 == 0)
-            goku_active = goku_state.update(goku_condition)
-            
-            # Update charge state
-            is_charging, is_releasing, charge_level = goku_charge.update(goku_active)
-            
-            if goku_active or is_releasing:
-                cx = (p0[0] + p1[0]) // 2
-                cy = (p0[1] + p1[1]) // 2
-
-                dist = np.sqrt((p0[0]-p1[0])**2 + (p0[1]-p1[1])**2)
-                
-                # CHARGING: Start small and grow with charge level + pulsing
-                if is_charging:
-                    # Start at 0.2x, grow to 1.2x max
-                    base_scale = 0.2
-                    charge_multiplier = 1.0 + (charge_level * 5.0)  # Grows from 1.0x to 6.0x of base
-                    pulse = 1.0 + (0.1 * math.sin(time.time() * 8))  # Subtle pulsing
-                    vfx_scale = base_scale * charge_multiplier * pulse
-                    
-                    # Use pre-rotated asset (faster rotation while charging)
-                    angle = (cv2.getTickCount() % 3600) / (15 - charge_level * 10)  # Speeds up
-                    rotated = vfx.get_prerotated(goku_rotations, angle)
-                    
-                    active_vfx = rotated
-                    vfx_center = (cx, cy)
-                    
-                    # Display charge status
-                    charge_percent = int(charge_level * 100)
-                    put_text(frame, f"CHARGING... {charge_percent}%", (10, 60), color=(100, 200, 255), scale=0.9)
-                    
-                    # Draw charge bar
-                    bar_w = 300
-                    bar_h = 25
-                    bar_x = (w - bar_w) // 2
-                    bar_y = h - 80
-                    
-                    # Background
-                    cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_w, bar_y + bar_h), (50, 50, 50), -1)
-                    # Fill based on charge
-                    fill_w = int(bar_w * charge_level)
-                    color = (0, int(255 * (1 - charge_level)), int(255 * charge_level))  # Green -> Red
-                    cv2.rectangle(frame, (bar_x, bar_y), (bar_x + fill_w, bar_y + bar_h), color, -1)
-                    # Border
-                    cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_w, bar_y + bar_h), (255, 255, 255), 2)
-                    
-                # RELEASING: Shoot upward with animation
-                elif is_releasing:
-                    release_progress = goku_charge.get_release_progress()
-                    
-                    # Move upward
-                    offset_y = -release_progress * h * 0.9  # Moves up 90% of screen
-                    release_cy = cy + int(offset_y)
-                    
-                    # Grow moderately during release (not too big)
-                    release_scale = 1.2 * (1.0 + release_progress * 0.8)  # Max 2.16x
-                    
-                    # Fast rotation during release
-                    angle = (cv2.getTickCount() % 3600) / 3
-                    rotated = vfx.get_prerotated(goku_rotations, angle)
-                    
-                    # Create trail effect
-                    for i in range(5):
-                        trail_offset = i * 50
-                        trail_cy = release_cy + trail_offset
-                        if trail_cy < h:
-                            trail_scale = release_scale * (1.0 - i * 0.15)
-                            trail_alpha = 1.0 - (i * 0.2) - (release_progress * 0.3)
-                            if trail_alpha > 0:
-                                # Apply transparency by blending
-                                trail_vfx = (rotated * trail_alpha).astype(np.uint8)
-                                frame = vfx.overlay_png(frame, trail_vfx, (cx, trail_cy), scale=trail_scale)
-                    
-                    vfx_center = (cx, release_cy)
-                    vfx_scale = release_scale
-                    active_vfx = rotated
-                    
-                    put_text(frame, "SPIRIT BOMB RELEASED!", (10, 60), color=(255, 255, 0), scale=1.0)
-
-        # Reset states when hand count doesn't match
-        if len(hands) != 1:
-            freeza_state.update(False)
-            rasengan_state.update(False)
-        if len(hands) != 2:
-            goku_state.update(False)
-
-        # ========= OVERLAY =========
-        if active_vfx is not None:
-            frame = vfx.overlay_png(frame, active_vfx, vfx_center, scale=vfx_scale)
+    if args.pipelined:
+        frames = pipelined_frames(cap, detector, ring)
+    else:
+        frames = serial_frames(cap, detector, ring, allocs, scheduler)
+    for frame, hands, t_capture in frames:
+        frame = apply_effects(frame, hands, vfx, sprites)
+        h, w = frame.shape[:2]
 
         # FPS calculation
         fps_counter += 1
@@ -313,16 +357,35 @@ def main():
             fps_start_time = time.time()
 
         # Display FPS and controls
-        put_text(frame, f"FPS: {current_fps}", (10, 30), color=(0, 255, 255), scale=0.8)
-        put_text(frame, "Esc: Quit | S: Skeleton", (10, h - 20))
-        cv2.imshow("AnimeCast LIVE", frame)
-
-        key = cv2.waitKey(1) & 0xFF
+        with timers.stage('hud'):
+            put_text(frame, f"FPS: {current_fps}", (10, 30), color=(0, 255, 255), scale=0.8)
+            put_text(frame, "Esc: Quit | S: Skeleton", (10, h - 20))
+            if args.hud:
+                timers.draw_hud(frame)
+        with timers.stage('imshow'):
+            cv2.imshow("AnimeCast LIVE", frame)
+        # Capture to display, not counting the wait for the camera
+        frame_time = time.perf_counter() - t_capture
+        latency.add(frame_time)
+        if governor is not None:
+            governor.add(frame_time)
+
+        with timers.stage('waitKey'):
+            key = cv2.waitKey(1) & 0xFF
         if key == 27:
             break
         if key == ord('s'):
             show_skeleton = not show_skeleton
 
+    frames.close()
+    print(latency.summary("Capture to display (pipelined)" if args.pipelined else "Capture to display (serial)"))
+    if allocs.enabled:
+        print(allocs.summary("Capture path allocations"))
+    if governor is not None:
+        print(governor.summary())
+    if args.metrics_file:
+        timers.dump(args.metrics_file)
+        print(f"Stage timings written to {args.metrics_file}")
     cap.release()
     cv2.destroyAllWindows()
 
@@ -0,0 +1,87 @@
+# src/admission.py
+import time
+
+
+class AdmissionController:
+    """
+    Global frame budget across sessions.
+
+    Arrivals are counted per session over a window. When the projected
+    processing rate exceeds budget_fps, the busiest sessions are demoted
+    to low_hz one at a time until the projection fits; everyone else keeps
+    their full rate. Once load falls below recover * budget_fps, demoted
+    sessions are restored one per window (the hysteresis keeps a session
+    from flapping between rates).
+    """
+    def __init__(self, budget_fps, low_hz=10.0, window=1.0, recover=0.8, clock=time.perf_counter):
+        self.budget_fps = budget_fps
+        self.low_interval = 1.0 / low_hz
+        self.low_hz = low_hz
+        self.window = window
+        self.recover = recover
+        self.clock = clock
+        self.arrivals = {}       # key -> arrivals in the current window
+        self.rates = {}          # key -> arrivals/s in the last full window
+        self.demoted = {}        # key -> time demoted
+        self.last_served = {}    # key -> time of last processed frame
+        self.window_start = clock()
+        self.demotions = 0
+
+    def observe(self, key):
+        """Count one arriving frame for key."""
+        self.arrivals[key] = self.arrivals.get(key, 0) + 1
+
+    def due(self, key, now):
+        """Whether key's pending frame may be processed now."""
+        if key not in self.demoted:
+            return True
+        return now - self.last_served.get(key, 0.0) >= self.low_interval
+
+    def served(self, key, now):
+        self.last_served[key] = now
+
+    def forget(self, key):
+        for table in (self.arrivals, self.rates, self.demoted, self.last_served):
+            table.pop(key, None)
+
+    def projected(self):
+        """Frames/s the current rates and demotions would have us process."""
+        return sum(min(rate, self.low_hz) if key in self.demoted else rate
+                   for key, rate in self.rates.items())
+
+    def update(self, now=None):
+        """Close the window if it has elapsed and rebalance demotions."""
+        now = self.clock() if now is None else now
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return
+        self.rates = {key: count / elapsed for key, count in self.arrivals.items()}
+        self.arrivals = {}
+        self.window_start = now
+        for key in [k for k in self.demoted if k not in self.rates]:
+            del self.demoted[key]  # session went quiet
+
+        load = self.projected()
+        if load > self.budget_fps:
+            for key in sorted(self.rates, key=self.rates.get, reverse=True):
+                if load <= self.budget_fps:
+                    break
+                if key in self.demoted or self.rates[key] <= self.low_hz:
+                    continue
+                self.demoted[key] = now
+                self.demotions += 1
+                load -= self.rates[key] - self.low_hz
+        elif load < self.recover * self.budget_fps and self.demoted:
+            # Most recently demoted first, only if it still fits after restoring
+            key = max(self.demoted, key=self.demoted.get)
+            gain = self.rates.get(key, 0.0) - self.low_hz
+            if load + gain <= self.recover * self.budget_fps:
+                del self.demoted[key]
+
+    def stats(self):
+        return {
+            'budget_fps': self.budget_fps,
+            'load_fps': self.projected(),
+            'demoted': len(self.demoted),
+            'demotions': self.demotions,
+        }
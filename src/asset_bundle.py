@@ -0,0 +1,315 @@
+# src/asset_bundle.py
+"""
+Precompiled VFX assets.
+
+    python -m src.asset_bundle [--dir assets/.bundle] [--force] [--workers N]
+
+Decoding the PNGs, building mip pyramids and rotating every asset 72 times
+is the same work on every start, so it is done once into a bundle
+directory: one .npy per array plus manifest.json recording each source's
+SHA-256 and the parameters it was built with. Entry points memory-map the
+arrays (np.load mmap_mode='r'), which costs no decode and no copy, and
+worker processes share the pages through the OS page cache.
+
+An asset is rebuilt only when its PNG content, rotation steps or working
+scale changed, or when BUNDLE_VERSION is bumped. Rotations are generated
+on a thread pool (warpAffine releases the GIL) straight into the output
+files. Array files carry the source hash in their name and a bundle maps
+every array when it is opened, so a process still using the previous
+build is never affected by a rebuild.
+
+Building needs fcntl for its directory lock (POSIX). Elsewhere a missing or
+stale bundle makes open_bundle() return None, and the entry points load the
+PNGs directly.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:   # Windows: no directory lock, so no bundle builds
+    fcntl = None
+
+import cv2
+import numpy as np
+
+from src.sprite_atlas import AtlasRotations
+from src.sprite_cache import mip_levels
+
+BUNDLE_VERSION = 1
+DEFAULT_DIR = os.path.join('assets', '.bundle')
+MANIFEST = 'manifest.json'
+MIP_MIN_SIZE = 16
+
+# name: (png path, rotation steps, working scale of the pre-rotated block)
+VFX_ASSETS = {
+    'freeza': ("assets/vfx/freeza/f1.png", 72, 0.3),
+    'goku': ("assets/vfx/goku/g1.png", 72, 1.2),
+    'rasengan': ("assets/vfx/naruto/n1.png", 72, 0.25),
+}
+
+
+def bundle_dir():
+    """Bundle directory from ANIMECAST_ASSET_BUNDLE; '0' or 'off' disables the bundle."""
+    directory = os.environ.get('ANIMECAST_ASSET_BUNDLE', DEFAULT_DIR)
+    return None if directory in ('0', 'off') else directory
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': BUNDLE_VERSION, 'assets': {}}
+    if manifest.get('version') != BUNDLE_VERSION:
+        return {'version': BUNDLE_VERSION, 'assets': {}}
+    return manifest
+
+
+def _write_manifest(directory, manifest):
+    tmp = os.path.join(directory, f"{MANIFEST}.tmp-{os.getpid()}")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def _entry_files(entry):
+    files = entry['files']
+    return [files['source'], files['rotations']] + files['mips']
+
+
+def is_fresh(directory, entry, path, steps, working_scale):
+    """
+    Whether a manifest entry still describes path built with these
+    parameters. An unchanged size and mtime skip hashing the file.
+    """
+    if (entry is None or entry['source'] != path or entry['steps'] != steps
+            or entry['working_scale'] != working_scale or entry['mip_min_size'] != MIP_MIN_SIZE):
+        return False
+    if not all(os.path.exists(os.path.join(directory, f)) for f in _entry_files(entry)):
+        return False
+    st = os.stat(path)
+    if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+        return True
+    if file_sha256(path) != entry['sha256']:
+        return False
+    entry['size'], entry['mtime_ns'] = st.st_size, st.st_mtime_ns  # touched, not changed
+    return True
+
+
+def _save(directory, filename, array):
+    tmp = os.path.join(directory, f"{filename}.tmp-{os.getpid()}.npy")
+    np.save(tmp, np.ascontiguousarray(array))
+    os.replace(tmp, os.path.join(directory, filename))
+
+
+def _rotate_into(frames, src, start, stop):
+    h, w = src.shape[:2]
+    steps = frames.shape[0]
+    for i in range(start, stop):
+        M = cv2.getRotationMatrix2D((w//2, h//2), i * 360.0 / steps, 1.0)
+        cv2.warpAffine(
+            src, M, (w, h), dst=frames[i],
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0, 0)
+        )
+
+
+def compile_assets(specs=VFX_ASSETS, directory=DEFAULT_DIR, workers=None, force=False, vfx=None):
+    """
+    Build every stale asset of specs into directory and update the
+    manifest. Returns the names that were rebuilt. Holds an exclusive lock
+    on the directory, so concurrent workers build each asset once.
+    Raises OSError where fcntl is unavailable.
+    """
+    if fcntl is None:
+        raise OSError("building the asset bundle needs POSIX file locks (fcntl)")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = _read_manifest(directory)
+        stale = {name: spec for name, spec in specs.items()
+                 if force or not is_fresh(directory, manifest['assets'].get(name), *spec)}
+        if not stale:
+            _write_manifest(directory, manifest)  # keep refreshed mtimes
+            return []
+
+        if vfx is None:
+            from src.vfx_engine import VFXEngine
+            vfx = VFXEngine()
+        tasks, blocks = [], []
+        for name, (path, steps, working_scale) in stale.items():
+            sha = file_sha256(path)
+            stem = f"{name}-{sha[:12]}"
+            png = vfx.load_png(path)
+            levels = mip_levels(png, MIP_MIN_SIZE)
+
+            scale = min(1.0, working_scale)
+            work = png
+            if scale < 1.0:
+                h, w = png.shape[:2]
+                size = (max(1, int(w * scale)), max(1, int(h * scale)))
+                work = cv2.resize(png, size, interpolation=cv2.INTER_AREA)
+            rot_name = f"{stem}.rot.npy"
+            rot_tmp = os.path.join(directory, f"{rot_name}.tmp-{os.getpid()}.npy")
+            frames = np.lib.format.open_memmap(rot_tmp, mode='w+', dtype=np.uint8,
+                                               shape=(steps,) + work.shape)
+            blocks.append((frames, rot_tmp, rot_name))
+            # Eight rotations per task keeps every core busy on the big assets
+            tasks += [(frames, work, i, min(i + 8, steps)) for i in range(0, steps, 8)]
+
+            _save(directory, f"{stem}.src.npy", png)
+            mip_names = [f"{stem}.mip{i}.npy" for i in range(len(levels))]
+            for filename, level in zip(mip_names, levels):
+                _save(directory, filename, level)
+            st = os.stat(path)
+            manifest['assets'][name] = {
+                'source': path, 'sha256': sha, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                'steps': steps, 'working_scale': working_scale, 'rotation_scale': scale,
+                'mip_min_size': MIP_MIN_SIZE,
+                'files': {'source': f"{stem}.src.npy", 'rotations': rot_name, 'mips': mip_names},
+            }
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            list(pool.map(lambda task: _rotate_into(*task), tasks))
+        for frames, rot_tmp, rot_name in blocks:
+            frames.flush()
+            os.replace(rot_tmp, os.path.join(directory, rot_name))
+        tasks.clear()
+        blocks.clear()
+
+        _write_manifest(directory, manifest)
+        _remove_unreferenced(directory, manifest)
+        return list(stale)
+
+
+def _remove_unreferenced(directory, manifest):
+    """Delete array files no manifest entry points at (earlier builds)."""
+    keep = {f for entry in manifest['assets'].values() for f in _entry_files(entry)}
+    for filename in os.listdir(directory):
+        if filename.endswith('.npy') and '.tmp-' not in filename and filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+class AssetBundle:
+    """Read-only memory-mapped view of a compiled bundle."""
+    def __init__(self, directory, manifest, arrays):
+        self.directory = directory
+        self.manifest = manifest
+        self.arrays = arrays      # filename -> memory-mapped array
+        self.rebuilt = []
+
+    @classmethod
+    def open(cls, specs=VFX_ASSETS, directory=DEFAULT_DIR, build=True, workers=None, vfx=None):
+        """
+        Map the bundle for specs, compiling stale assets first when build
+        is set. Raises FileNotFoundError when an asset is missing or stale
+        and build is off.
+
+        Every array of specs is mapped here, not on first use: a concurrent
+        rebuild deletes the files its new manifest no longer names, which a
+        mapping survives but a later open does not. A file that vanishes
+        between reading the manifest and mapping it means such a rebuild
+        finished; its manifest is read and mapping starts over.
+        """
+        rebuilt = []
+        for _ in range(3):
+            manifest = _read_manifest(directory)
+            stale = [name for name, spec in specs.items()
+                     if not is_fresh(directory, manifest['assets'].get(name), *spec)]
+            if stale and build:
+                # Nothing is written when the bundle is current, so a read-only
+                # bundle directory works as long as it is up to date
+                rebuilt += compile_assets(specs, directory, workers, vfx=vfx)
+                manifest = _read_manifest(directory)
+            elif stale:
+                raise FileNotFoundError(f"Asset {stale[0]!r} is missing or stale in {directory}")
+            try:
+                arrays = {f: np.load(os.path.join(directory, f), mmap_mode='r')
+                          for name in specs for f in _entry_files(manifest['assets'][name])}
+            except FileNotFoundError:
+                continue
+            bundle = cls(directory, manifest, arrays)
+            bundle.rebuilt = rebuilt
+            return bundle
+        raise FileNotFoundError(f"Asset files in {directory} kept changing while being mapped")
+
+    def _load(self, filename):
+        return self.arrays[filename]
+
+    def source(self, name):
+        """The asset's BGRA array, as VFXEngine.load_png returns it."""
+        return self._load(self.manifest['assets'][name]['files']['source'])
+
+    def mips(self, name):
+        """Mip pyramid for SpriteCache.add_asset(levels=...)."""
+        return [self._load(f) for f in self.manifest['assets'][name]['files']['mips']]
+
+    def rotations(self, name):
+        """Pre-rotated block, a drop-in for RotationSet / SpriteAtlas.rotations()."""
+        entry = self.manifest['assets'][name]
+        return AtlasRotations(self._load(entry['files']['rotations']), entry['rotation_scale'])
+
+    @property
+    def nbytes(self):
+        """Bytes of all mapped arrays (not necessarily resident)."""
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+def open_bundle(specs=VFX_ASSETS, vfx=None):
+    """
+    AssetBundle at bundle_dir(), built if needed, or None when the bundle
+    is disabled or cannot be written (callers then load the PNGs directly).
+    """
+    directory = bundle_dir()
+    if directory is None:
+        return None
+    t0 = time.perf_counter()
+    try:
+        bundle = AssetBundle.open(specs, directory, vfx=vfx)
+    except OSError as e:
+        print(f"⚠ Asset bundle unavailable ({e}); loading PNGs directly")
+        return None
+    if bundle.rebuilt:
+        print(f"✓ Compiled {', '.join(bundle.rebuilt)} into {directory} "
+              f"in {time.perf_counter() - t0:.2f} s")
+    return bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dir', default=bundle_dir() or DEFAULT_DIR)
+    parser.add_argument('--force', action='store_true', help='rebuild every asset')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    rebuilt = compile_assets(VFX_ASSETS, args.dir, args.workers, force=args.force)
+    elapsed = time.perf_counter() - t0
+    bundle = AssetBundle.open(VFX_ASSETS, args.dir, build=False)
+    for name in VFX_ASSETS:
+        rotations = bundle.rotations(name)
+        status = 'built' if name in rebuilt else 'fresh'
+        print(f"{name:<10} {status:<6} source {bundle.source(name).shape} | "
+              f"{len(bundle.mips(name))} mips | rotations {rotations.frames.shape}")
+    print(f"{bundle.nbytes / 1e6:.1f} MB in {args.dir} ({elapsed:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
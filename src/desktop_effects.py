@@ -0,0 +1,280 @@
+# src/desktop_effects.py
+"""
+main.py's effects for the EffectRegistry. Each frame is an EffectFrame;
+render() draws its captions, gauges and particles onto the frame and
+returns the sprites to composite as overlay_batch instances
+(sprite, center, scale, opacity, z). The beams and bursts are particles
+(src.vfx_engine.ParticleSystem) kept in the effect state; they are
+advanced on the frame's timestamp in every phase, so they keep flying and
+fading after the release that spawned them.
+"""
+import math
+
+import cv2
+import numpy as np
+
+import src.gesture_logic as gestures
+from src.effect_registry import Effect
+from src.gesture_logic import ChargeState, GestureState
+from src.utils import get_grid_position, put_text
+from src.vfx_engine import ParticleSystem
+
+
+class EffectFrame:
+    """One desktop frame as the effects see it."""
+    __slots__ = ('frame', 'hands', 'masks', 'w', 'h', 'now', 'ticks', 'sprites', 'vfx', 'hand_count')
+
+    def __init__(self, frame, hands, masks, now, ticks, sprites, vfx):
+        self.frame = frame
+        self.hands = hands
+        self.masks = masks          # classify_all bits per hand
+        self.h, self.w = frame.shape[:2]
+        self.now = now              # seconds (wall clock or frame timestamp)
+        self.ticks = ticks          # cv2 ticks matching now, for spin angles
+        self.sprites = sprites      # SpriteCache
+        self.vfx = vfx              # VFXEngine (draw_particles)
+        self.hand_count = len(hands)
+
+
+class ChargedGesture:
+    """Debounced gesture driving a charge-up / release cycle, and its particles."""
+    __slots__ = ('gesture', 'charge', 'particles', 'burst_at')
+
+    def __init__(self, gesture, charge, particles=None):
+        self.gesture = gesture
+        self.charge = charge
+        self.particles = particles
+        self.burst_at = None        # release_time of the release that already burst
+
+
+class Rasengan(Effect):
+    """Single open palm: spinning sphere at the palm center."""
+    name = 'rasengan'
+    hands = 1
+    features = gestures.OPEN_PALM
+
+    def __init__(self, priority=0, on_frames=3, off_frames=5):
+        self.priority = priority
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+
+    def new_state(self):
+        return GestureState(self.on_frames, self.off_frames)
+
+    def update(self, ctx, state):
+        return True if state.update(bool(ctx.masks[0] & gestures.OPEN_PALM)) else None
+
+    def idle(self, state):
+        return state.update(False)
+
+    def render(self, ctx, state, phase):
+        hand = ctx.hands[0]
+        palm_x, palm_y = gestures.get_palm_center_pixel(hand, ctx.w, ctx.h)
+
+        # Scale with palm size (wrist to middle MCP), kept small
+        palm_size = abs(hand.landmark[0].y - hand.landmark[9].y) * ctx.h
+        scale = max(0.15, min(0.3, palm_size / 180))
+
+        angle = (ctx.ticks % 3600) / 5  # fast spin
+        put_text(ctx.frame, "RASENGAN!", (10, 60), color=(100, 150, 255), scale=0.9)
+        return [(ctx.sprites.get('naruto', angle, scale), (palm_x, palm_y), 1.0, 1.0, 0)]
+
+
+class FreezaBeam(Effect):
+    """Only the index finger up: charges at the fingertip, then fires a beam."""
+    name = 'freeza'
+    hands = 1
+    features = gestures.ONLY_INDEX
+
+    def __init__(self, priority=1, on_frames=3, off_frames=5, max_charge_time=6.0,
+                 release_duration=1.5, beam_rate=900, max_particles=512):
+        self.priority = priority
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+        self.max_charge_time = max_charge_time
+        self.release_duration = release_duration
+        self.beam_rate = beam_rate          # particles / second while the beam fires
+        self.max_particles = max_particles
+        self.particle_density = 1.0         # emission multiplier (quality tiers lower it)
+
+    def new_state(self):
+        return ChargedGesture(GestureState(self.on_frames, self.off_frames),
+                              ChargeState(self.max_charge_time, self.release_duration),
+                              ParticleSystem(self.max_particles, drag=1.5))
+
+    def update(self, ctx, state):
+        active = state.gesture.update(bool(ctx.masks[0] & gestures.ONLY_INDEX))
+        is_charging, is_releasing, charge_level = state.charge.update(active, ctx.now)
+        if active or is_releasing:
+            return is_charging, is_releasing, charge_level
+        return None
+
+    def idle(self, state):
+        return state.gesture.update(False)
+
+    def render(self, ctx, state, phase):
+        is_charging, is_releasing, charge_level = phase
+        frame, w, h = ctx.frame, ctx.w, ctx.h
+        hand = ctx.hands[0]
+        cx, cy = gestures.get_fingertip_pixel(hand, w, h)
+
+        # Base scale from the index finger's length
+        finger_length = abs(hand.landmark[8].y - hand.landmark[6].y) * h
+        base_scale = max(0.15, min(0.35, finger_length / 200))
+        particles = state.particles
+        dt = particles.step(ctx.now)
+
+        if is_charging:
+            # Shrinks to 60% as it charges (more focused), with a fast pulse
+            pulse = 1.0 + (0.08 * math.sin(ctx.now * 10))
+            scale = base_scale * (1.0 - charge_level * 0.4) * pulse
+            put_text(frame, f"Charging Beam... {int(charge_level * 100)}%", (10, 60),
+                     color=(200, 100, 255), scale=0.8)
+            cv2.circle(frame, (cx, cy), int(5 + charge_level * 10), (200, 100, 255), 2)
+
+        elif is_releasing:
+            # Beam shoots out in the pointing direction (wrist -> fingertip)
+            wrist = hand.landmark[0]
+            angle_rad = math.atan2(cy - int(wrist.y * h), cx - int(wrist.x * w))
+            progress = state.charge.get_release_progress(ctx.now)
+            beam_distance = progress * w * 0.8  # travels 80% of the screen width
+            scale = base_scale * 0.6            # compact beam
+            self._emit_beam(particles, (cx, cy), angle_rad, beam_distance, dt)
+            put_text(frame, "DEATH BEAM!", (10, 60), color=(255, 100, 200), scale=1.0)
+
+        else:
+            scale = base_scale
+
+        ctx.vfx.draw_particles(frame, particles)
+
+        # The head stays on the fingertip in every phase
+        angle = (ctx.ticks % 3600) / 20
+        put_text(frame, "Freeza Beam", (10, 60), color=(200, 100, 255))
+        return [(ctx.sprites.get('freeza', angle, scale), (cx, cy), 1.0, 1.0, 0)]
+
+    def _emit_beam(self, particles, origin, angle_rad, distance, dt):
+        """Sparks along the beam from the fingertip to its front, streaming outwards."""
+        n = int(self.beam_rate * self.particle_density * dt + 0.5)
+        if n == 0:
+            return
+        rng = particles.rng
+        direction = np.array([math.cos(angle_rad), math.sin(angle_rad)], dtype=np.float32)
+        normal = np.array([-direction[1], direction[0]], dtype=np.float32)
+        along = rng.uniform(0.0, distance, n).astype(np.float32)
+        across = rng.normal(0.0, 3.0, n).astype(np.float32)
+        pos = np.float32(origin) + along[:, None] * direction + across[:, None] * normal
+        speed = rng.uniform(150.0, 400.0, n).astype(np.float32)
+        vel = speed[:, None] * direction + rng.normal(0.0, 30.0, (n, 1)).astype(np.float32) * normal
+        # Pink-violet, a few hotter (whiter) sparks in the core
+        hot = rng.uniform(0.0, 1.0, (n, 1)) < 0.25
+        color = np.where(hot, (255, 200, 255), (255, 90, 200)) * rng.uniform(0.4, 0.8, (n, 1))
+        particles.emit(pos, vel, rng.uniform(0.2, 0.5, n), rng.uniform(2.0, 6.0, n), color)
+
+
+class SpiritBomb(Effect):
+    """Both palms in the top row of the frame: charge a growing sphere, then throw it up."""
+    name = 'goku'
+    hands = 2
+
+    def __init__(self, priority=0, on_frames=3, off_frames=5, max_charge_time=10.0,
+                 release_duration=2.0, trail_rate=600, burst=150, max_particles=768):
+        self.priority = priority
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+        self.max_charge_time = max_charge_time
+        self.release_duration = release_duration
+        self.trail_rate = trail_rate        # particles / second shed by the rising sphere
+        self.burst = burst                  # particles thrown out when it is released
+        self.max_particles = max_particles
+        self.particle_density = 1.0         # emission multiplier (quality tiers lower it)
+
+    def new_state(self):
+        return ChargedGesture(GestureState(self.on_frames, self.off_frames),
+                              ChargeState(self.max_charge_time, self.release_duration),
+                              ParticleSystem(self.max_particles, drag=0.8, gravity=(0.0, 150.0)))
+
+    def update(self, ctx, state):
+        p0 = gestures.get_palm_center_pixel(ctx.hands[0], ctx.w, ctx.h)
+        p1 = gestures.get_palm_center_pixel(ctx.hands[1], ctx.w, ctx.h)
+        r0, _ = get_grid_position(p0[0], p0[1], ctx.w, ctx.h)
+        r1, _ = get_grid_position(p1[0], p1[1], ctx.w, ctx.h)
+
+        active = state.gesture.update(r0 == 0 and r1 == 0)
+        is_charging, is_releasing, charge_level = state.charge.update(active, ctx.now)
+        if active or is_releasing:
+            center = ((p0[0] + p1[0]) // 2, (p0[1] + p1[1]) // 2)
+            return is_charging, is_releasing, charge_level, center
+        return None
+
+    def idle(self, state):
+        return state.gesture.update(False)
+
+    def render(self, ctx, state, phase):
+        is_charging, is_releasing, charge_level, (cx, cy) = phase
+        frame, w, h = ctx.frame, ctx.w, ctx.h
+        particles = state.particles
+        dt = particles.step(ctx.now)
+
+        if is_charging:
+            # Starts at 0.2x and grows to 1.2x with the charge, pulsing gently
+            pulse = 1.0 + (0.1 * math.sin(ctx.now * 8))
+            scale = 0.2 * (1.0 + charge_level * 5.0) * pulse
+            angle = (ctx.ticks % 3600) / (15 - charge_level * 10)  # speeds up
+            put_text(frame, f"CHARGING... {int(charge_level * 100)}%", (10, 60),
+                     color=(100, 200, 255), scale=0.9)
+
+            # Charge bar, green -> red
+            bar_w, bar_h = 300, 25
+            bar_x, bar_y = (w - bar_w) // 2, h - 80
+            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_w, bar_y + bar_h), (50, 50, 50), -1)
+            color = (0, int(255 * (1 - charge_level)), int(255 * charge_level))
+            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + int(bar_w * charge_level), bar_y + bar_h), color, -1)
+            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_w, bar_y + bar_h), (255, 255, 255), 2)
+            ctx.vfx.draw_particles(frame, particles)
+            # Grows every frame: a coarse cached size plus a small resize
+            sprite, residual = ctx.sprites.get_animated('goku', angle, scale)
+            return [(sprite, (cx, cy), residual, 1.0, 0)]
+
+        if is_releasing:
+            # Rises 90% of the screen, growing to at most 2.16x, sparks trailing below
+            progress = state.charge.get_release_progress(ctx.now)
+            release_cy = cy + int(-progress * h * 0.9)
+            scale = 1.2 * (1.0 + progress * 0.8)
+            angle = (ctx.ticks % 3600) / 3
+            if state.burst_at != state.charge.release_time:
+                state.burst_at = state.charge.release_time
+                self._emit_burst(particles, (cx, cy))
+            self._emit_trail(particles, (cx, release_cy), 60.0 * scale, dt)
+            ctx.vfx.draw_particles(frame, particles)
+            put_text(frame, "SPIRIT BOMB RELEASED!", (10, 60), color=(255, 255, 0), scale=1.0)
+            sprite, residual = ctx.sprites.get_animated('goku', angle, scale)
+            return [(sprite, (cx, release_cy), residual, 1.0, 0)]
+
+        # Held, between a finished release and the next charge
+        ctx.vfx.draw_particles(frame, particles)
+        return []
+
+    def _emit_burst(self, particles, center):
+        """Ring of sparks thrown out from where the sphere was released."""
+        n = int(self.burst * self.particle_density + 0.5)
+        if n == 0:
+            return
+        rng = particles.rng
+        theta = rng.uniform(0.0, 2 * math.pi, n)
+        speed = rng.uniform(150.0, 450.0, n)
+        vel = np.stack([np.cos(theta), np.sin(theta)], axis=1) * speed[:, None]
+        color = np.float32((255, 230, 160)) * rng.uniform(0.5, 0.9, (n, 1))
+        particles.emit(np.broadcast_to(np.float32(center), (n, 2)), vel,
+                       rng.uniform(0.5, 1.0, n), rng.uniform(3.0, 8.0, n), color)
+
+    def _emit_trail(self, particles, center, radius, dt):
+        """Sparks shed from the lower half of the rising sphere; they stay behind as it climbs."""
+        n = int(self.trail_rate * self.particle_density * dt + 0.5)
+        if n == 0:
+            return
+        rng = particles.rng
+        offset = np.stack([rng.uniform(-radius, radius, n), rng.uniform(0.0, radius, n)], axis=1)
+        vel = np.stack([rng.normal(0.0, 40.0, n), rng.uniform(0.0, 120.0, n)], axis=1)
+        color = np.float32((255, 220, 120)) * rng.uniform(0.4, 0.8, (n, 1))
+        particles.emit(np.float32(center) + offset, vel, rng.uniform(0.4, 0.9, n),
+                       rng.uniform(3.0, 9.0, n), color)
@@ -0,0 +1,112 @@
+# src/detection_scheduler.py
+import numpy as np
+
+from src.landmarks import HandLandmarks, as_array
+
+
+class DetectionScheduler:
+    """
+    Decides each frame whether to run hand detection.
+    Keeps a moving average of inference time and spaces detections so they
+    use at most detect_share of wall time at target_fps, but never drops
+    below min_hz. Fast machines end up detecting every frame.
+    """
+    def __init__(self, target_fps=30, detect_share=0.5, min_hz=10, smoothing=0.2):
+        self.frame_budget = 1.0 / target_fps
+        self.smoothing = smoothing
+        self.inference_time = None   # seconds, moving average
+        self.last_detect = None
+        self.set_cadence(detect_share, min_hz)
+
+    def set_cadence(self, detect_share, min_hz):
+        """Change the budget share and minimum rate; the inference average is kept."""
+        self.detect_share = detect_share
+        self.max_interval = 1.0 / min_hz
+
+    @property
+    def interval(self):
+        """Current minimum time between detections."""
+        if self.inference_time is None:
+            return 0.0
+        if self.inference_time <= self.frame_budget * self.detect_share:
+            return 0.0
+        return min(self.max_interval, self.inference_time / self.detect_share)
+
+    def should_detect(self, now):
+        if self.last_detect is None:
+            return True
+        # Half a frame of slack so cadence doesn't slip by one frame each time
+        return now - self.last_detect >= self.interval - self.frame_budget / 2
+
+    def record(self, inference_seconds, now):
+        """Call after each detection with how long it took."""
+        if self.inference_time is None:
+            self.inference_time = inference_seconds
+        else:
+            self.inference_time += self.smoothing * (inference_seconds - self.inference_time)
+        self.last_detect = now
+
+    @property
+    def rate_hz(self):
+        interval = self.interval
+        return 1.0 / max(interval, self.frame_budget)
+
+
+class _Track:
+    __slots__ = ('position', 'velocity', 'time')
+
+    def __init__(self, position, time):
+        self.position = position
+        self.velocity = np.zeros_like(position)
+        self.time = time
+
+
+class LandmarkPredictor:
+    """
+    Alpha-beta (constant velocity) filter per landmark, per hand.
+    update() folds in each detection; predict() extrapolates every hand to
+    the display time so effects keep following the hand between detections.
+    Hands are matched to tracks by nearest wrist.
+    """
+    def __init__(self, alpha=0.9, beta=0.5, max_horizon=0.15, match_distance=0.2):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_horizon = max_horizon        # seconds we are willing to extrapolate
+        self.match_distance = match_distance  # normalized wrist distance for a match
+        self.tracks = []
+
+    def update(self, hands, t):
+        """hands: detection results (mediapipe or HandLandmarks); t: capture time."""
+        measured = [as_array(hand) for hand in hands]
+        unmatched = list(self.tracks)
+        tracks = []
+        for z in measured:
+            track = None
+            if unmatched:
+                dists = [np.hypot(*(tr.position[0, :2] - z[0, :2])) for tr in unmatched]
+                best = int(np.argmin(dists))
+                if dists[best] < self.match_distance:
+                    track = unmatched.pop(best)
+
+            if track is None:
+                track = _Track(z.copy(), t)
+            else:
+                dt = t - track.time
+                if dt > 0:
+                    predicted = track.position + track.velocity * dt
+                    residual = z - predicted
+                    track.position = predicted + self.alpha * residual
+                    track.velocity = track.velocity + (self.beta / dt) * residual
+                else:
+                    track.position = z.copy()
+                track.time = t
+            tracks.append(track)
+        self.tracks = tracks
+
+    def predict(self, t):
+        """List of HandLandmarks extrapolated to time t, in detection order."""
+        hands = []
+        for track in self.tracks:
+            dt = min(max(0.0, t - track.time), self.max_horizon)
+            hands.append(HandLandmarks(track.position + track.velocity * dt))
+        return hands
@@ -0,0 +1,104 @@
+# src/effect_events.py
+import math
+
+from src.wire_protocol import EFFECT_CODES, EFFECTS
+
+EVENT_START = 'start'
+EVENT_MOVE = 'move'
+EVENT_CHARGE = 'charge'
+EVENT_STOP = 'stop'
+
+
+class EffectEvents:
+    """
+    Event mode for web clients: instead of a processed_frame reply per
+    frame, only state transitions are sent, as effect_event messages:
+
+      start   an effect appeared or changed type
+      move    its position moved more than move_threshold pixels
+      charge  the Spirit Bomb charge crossed a milestone
+      stop    the effect ended
+
+    Each start/move/charge message is a full snapshot stamped with the
+    server time t, the angle at t and the angular velocity (deg/s), plus
+    the charge rate (per second) for the Spirit Bomb, so the client animates
+    on its own clock between messages. What was last announced lives in
+    the SessionState, so any worker can continue a session. The Spirit
+    Bomb scale grows one-for-one with its charge.
+
+    frames / sent / saved count every session this instance served (one per
+    process in web_app), not a single client.
+    """
+    def __init__(self, spin_rates, move_threshold=12.0, milestones=(0.25, 0.5, 0.75, 1.0),
+                 charge_time=10.0):
+        self.spin_rates = spin_rates          # effect type -> degrees per second
+        self.move_threshold = move_threshold
+        self.milestones = milestones
+        self.charge_time = charge_time
+        self.frames = 0
+        self.sent = 0
+
+    def _milestone(self, charge_level):
+        return sum(1 for m in self.milestones if charge_level >= m)
+
+    def update(self, state, payload, now):
+        """
+        Advance state for one processed frame's payload.
+        Returns the effect_event message to send, or None.
+        """
+        self.frames += 1
+        vfx = payload['vfx_data']
+        code = EFFECT_CODES[vfx['type']] if vfx else 0
+
+        if code != state.effect:
+            state.effect = code
+            if not code:
+                state.effect_start = None
+                return self._sent({'event': EVENT_STOP, 't': now})
+            state.effect_start = now
+            return self._snapshot(EVENT_START, state, vfx, now)
+        if not code:
+            return None
+
+        x, y = vfx['position']['x'], vfx['position']['y']
+        if math.hypot(x - state.sent_x, y - state.sent_y) > self.move_threshold:
+            return self._snapshot(EVENT_MOVE, state, vfx, now)
+        if 'charge_level' in vfx and self._milestone(vfx['charge_level']) > state.milestone:
+            return self._snapshot(EVENT_CHARGE, state, vfx, now)
+        return None
+
+    def _snapshot(self, event, state, vfx, now):
+        state.sent_x, state.sent_y = vfx['position']['x'], vfx['position']['y']
+        rate = self.spin_rates[vfx['type']]
+        message = {
+            'event': event,
+            'type': vfx['type'],
+            'effect': EFFECTS[state.effect][1],
+            't': now,
+            'angle': (rate * (now - state.effect_start)) % 360,
+            'angular_velocity': rate,
+            'position': dict(vfx['position']),
+            'scale': vfx['scale'],
+        }
+        if 'charge_level' in vfx:
+            charge = vfx['charge_level']
+            state.milestone = self._milestone(charge)
+            charge_rate = 0.0 if charge >= 1.0 else 1.0 / self.charge_time
+            message.update(charge_level=charge, charge_rate=charge_rate)
+        else:
+            state.milestone = 0
+        return self._sent(message)
+
+    def _sent(self, message):
+        self.sent += 1
+        return message
+
+    @property
+    def saved(self):
+        """Replies not sent compared with one per frame."""
+        return self.frames - self.sent
+
+    def summary(self):
+        ratio = self.frames / self.sent if self.sent else 0.0
+        return (f"Effect events: {self.sent} messages for {self.frames} frames "
+                f"({self.saved} saved, {ratio:.1f}x fewer)")
@@ -0,0 +1,108 @@
+# src/effect_registry.py
+"""
+Effects as data: each effect declares the hand count it needs, the gesture
+bits it reads (src.gesture_logic masks), its state machine (update) and its
+renderer (render). A registry dispatches one frame by trying only the
+effects registered for that frame's hand count, in priority order, and
+stopping at the first one that shows.
+
+The frame context is up to the front end (src/desktop_effects.py for
+main.py, src/web_effects.py for web_app.py); the registry only reads
+ctx.hand_count.
+"""
+from abc import ABC, abstractmethod
+
+
+class Effect(ABC):
+    """
+    Base class. Subclasses set name, hands, priority (lower is tried first)
+    and features (gesture bits the trigger reads), and implement update()
+    and render(). Effects with per-user state also implement new_state()
+    and idle().
+    """
+    name = None
+    hands = 1
+    priority = 0
+    features = 0
+
+    def new_state(self):
+        """Fresh per-user state, or None for effects that keep none."""
+        return None
+
+    @abstractmethod
+    def update(self, ctx, state):
+        """
+        Advance state for a frame with this effect's hand count. Returns a
+        phase (anything but None) when the effect shows this frame.
+        """
+
+    @abstractmethod
+    def render(self, ctx, state, phase):
+        """Draw / describe the effect for the phase update() returned."""
+
+    def idle(self, state):
+        """
+        Advance state for a frame with a different hand count. Returns
+        True while the state still needs idle calls (e.g. a debouncer
+        that has not settled yet).
+        """
+        return False
+
+
+class EffectStates(dict):
+    """
+    Per-user state of every effect in a registry, keyed by effect name.
+    awake holds the effects whose idle() still has work, so frames only
+    pay for the effects that were recently in use.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.awake = set()
+
+
+class EffectRegistry:
+    def __init__(self, effects=()):
+        self.effects = {}     # name -> Effect
+        self.by_hands = {}    # hand count -> [Effect] by priority
+        self.features = 0     # union of every effect's gesture bits
+        for effect in effects:
+            self.register(effect)
+
+    def register(self, effect):
+        if effect.name in self.effects:
+            raise ValueError(f"Effect {effect.name!r} is already registered")
+        self.effects[effect.name] = effect
+        group = self.by_hands.setdefault(effect.hands, [])
+        group.append(effect)
+        group.sort(key=lambda e: e.priority)   # stable: ties keep registration order
+        self.features |= effect.features
+        return effect
+
+    def new_states(self):
+        return EffectStates((name, effect.new_state()) for name, effect in self.effects.items())
+
+    def dispatch(self, ctx, states=None):
+        """
+        Run one frame. Returns (effect, phase) for the first effect that
+        shows, or None. Effects after it in priority order are not updated
+        this frame. states: from new_states(), or None when the effects keep
+        their state elsewhere (web sessions).
+        """
+        n = ctx.hand_count
+        shown = None
+        for effect in self.by_hands.get(n, ()):
+            if states is None:
+                phase = effect.update(ctx, None)
+            else:
+                phase = effect.update(ctx, states[effect.name])
+                states.awake.add(effect.name)
+            if phase is not None:
+                shown = (effect, phase)
+                break
+
+        if states is not None and states.awake:
+            for name in list(states.awake):
+                effect = self.effects[name]
+                if effect.hands != n and not effect.idle(states[name]):
+                    states.awake.discard(name)
+        return shown
@@ -0,0 +1,109 @@
+# src/frame_batcher.py
+import time
+from collections import deque
+
+import numpy as np
+
+from src.pipeline import LatencyStats
+
+
+class FrameBatcher:
+    """
+    Collects incoming events for one tick and hands them to process_batch
+    in a single call, so per-event Python overhead is paid once per batch.
+    Latency is measured from submit() to the end of the batch that handled
+    the event.
+
+    Pending events are latest-wins per key: a newer event from the same
+    session replaces one that has not been processed yet, and the replaced
+    one is counted as dropped. With an AdmissionController, a demoted
+    session's newest event waits in pending until its lower rate is due.
+    """
+    def __init__(self, process_batch, tick=0.003, sleep=time.sleep, report_every=10.0,
+                 admission=None):
+        self.process_batch = process_batch   # callable(list of (key, data, t_received))
+        self.tick = tick
+        self.sleep = sleep                   # socketio.sleep under eventlet
+        self.report_every = report_every
+        self.admission = admission
+        self.pending = {}                    # key -> (data, t_received)
+        self.latency = LatencyStats()
+        self.batch_sizes = deque(maxlen=1000)
+        self.processed = 0
+        self.dropped = 0
+        self.drops = {}                      # key -> superseded events
+        self.running = False
+
+    def submit(self, key, data):
+        if key in self.pending:
+            self.dropped += 1
+            self.drops[key] = self.drops.get(key, 0) + 1
+        self.pending[key] = (data, time.perf_counter())
+        if self.admission is not None:
+            self.admission.observe(key)
+
+    def forget(self, key):
+        """Discard a disconnected session's pending event and counters."""
+        self.pending.pop(key, None)
+        self.drops.pop(key, None)
+        if self.admission is not None:
+            self.admission.forget(key)
+
+    def flush(self):
+        now = time.perf_counter()
+        if self.admission is None:
+            batch = [(key, data, t) for key, (data, t) in self.pending.items()]
+            self.pending = {}
+        else:
+            self.admission.update(now)
+            batch = [(key, data, t) for key, (data, t) in self.pending.items()
+                     if self.admission.due(key, now)]
+            for key, _, _ in batch:
+                del self.pending[key]
+                self.admission.served(key, now)
+        if not batch:
+            return 0
+        self.process_batch(batch)
+        done = time.perf_counter()
+        for _, _, t_received in batch:
+            self.latency.add(done - t_received)
+        self.batch_sizes.append(len(batch))
+        self.processed += len(batch)
+        return len(batch)
+
+    def start(self, spawn):
+        """Start run() with spawn (e.g. socketio.start_background_task)."""
+        self.running = True
+        spawn(self.run)
+
+    def run(self):
+        """Background loop: flush every tick until stop()."""
+        self.running = True
+        last_report = time.time()
+        while self.running:
+            self.sleep(self.tick)
+            self.flush()
+            if self.report_every and time.time() - last_report >= self.report_every:
+                print(self.summary())
+                last_report = time.time()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        p = self.latency.percentiles((50, 99))
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64) if self.batch_sizes else np.zeros(1)
+        return {
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'mean_batch': float(sizes.mean()),
+            'p50_ms': p[50],
+            'p99_ms': p[99],
+            'demoted': len(self.admission.demoted) if self.admission is not None else 0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Batcher: {s['processed']} events ({s['dropped']} superseded, "
+                f"{s['demoted']} sessions demoted) | mean batch {s['mean_batch']:.1f} | "
+                f"p50 {s['p50_ms']:.1f} ms | p99 {s['p99_ms']:.1f} ms")
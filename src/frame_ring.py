@@ -0,0 +1,252 @@
+# src/frame_ring.py
+"""
+Preallocated buffers for the capture -> mirror -> detection-input path.
+
+Each camera frame used to cost four new images (cap.read, cv2.flip,
+cv2.resize, cv2.cvtColor). FrameRing keeps a few FrameSlots, each holding
+those images at their final sizes, and hands out free ones; every OpenCV
+call writes into its slot through dst=, so the steady state allocates no
+image memory. A slot is only reused once every consumer released it.
+
+Mirror modes:
+    'image'      flip the camera image into the slot's frame and detect on
+                 the mirrored image (the classic selfie view)
+    'landmarks'  detect on the camera image as delivered and mirror the
+                 landmarks instead (x -> 1 - x); the frame is mirrored in
+                 place for display, so the slot needs no second full-size
+                 image and detection does not wait for the flip
+    'none'       no mirroring at all
+
+AllocationCounter (debug only) measures the traced bytes allocated inside
+a block with tracemalloc, to show the path stays allocation-free.
+"""
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from src.landmarks import HandLandmarks, as_array
+from src.utils import detection_size
+
+MIRROR_MODES = ('image', 'landmarks', 'none')
+
+
+class FrameSlot:
+    """One frame's buffers. frame is what gets drawn on and shown."""
+    __slots__ = ('capture', 'frame', 'small', 'rgb', 't_capture', 'mirrored', 'refs')
+
+    def __init__(self, width, height, detection_width, mirror):
+        dw, dh = detection_size(width, height, detection_width)
+        self.capture = np.empty((height, width, 3), dtype=np.uint8)
+        # Only image mode keeps a separate mirrored copy
+        self.frame = np.empty_like(self.capture) if mirror == 'image' else self.capture
+        self.small = np.empty((dh, dw, 3), dtype=np.uint8)
+        self.rgb = np.empty_like(self.small)
+        self.t_capture = None
+        self.mirrored = False
+        self.refs = 0               # consumers still using it; 0 = free
+
+
+class FrameRing:
+    """
+    FrameSlots for one camera, reused once released. read() captures into
+    a free slot and returns it with one reference, owned by the caller;
+    hold() adds a reference for each further consumer, and every owner
+    calls release() when done with it. When no slot is free, the frame is
+    read into a scratch buffer and dropped (counted in dropped), so the
+    camera stays drained and nobody's frame is overwritten. The serial
+    loop holds one slot at a time; the pipelined threads hold up to four
+    (the renderer and the detector each work on one while a newer one
+    waits in their latest-wins handoff), so they get five slots.
+
+    Per frame:
+        slot = ring.read(cap)          # None when the camera gave nothing
+        rgb = ring.detection_input(slot)   # only on frames that run detection
+        frame = ring.display(slot)
+        ...
+        ring.release(slot)
+    detection_input must come before display in 'landmarks' mode.
+    """
+    def __init__(self, width=640, height=480, detection_width=640, slots=3, mirror='image'):
+        if mirror not in MIRROR_MODES:
+            raise ValueError(f"mirror must be one of {MIRROR_MODES}, not {mirror!r}")
+        self.detection_width = detection_width
+        self.mirror = mirror
+        self.count = slots
+        self.reallocations = 0
+        self.dropped = 0        # frames read while every slot was in use
+        self._pending = None    # (capture size, detection width) for the next read()
+        self._lock = threading.Lock()
+        self._allocate(width, height)
+
+    def _allocate(self, width, height):
+        self.size = (width, height)
+        self.detection_size = detection_size(width, height, self.detection_width)
+        # Slots still held by consumers are left to them and never reused
+        self.slots = [FrameSlot(width, height, self.detection_width, self.mirror)
+                      for _ in range(self.count)]
+        self.index = 0
+        self._scratch = None    # read target for dropped frames, made on the first drop
+
+    @property
+    def nbytes(self):
+        return sum(s.capture.nbytes + (s.frame.nbytes if s.frame is not s.capture else 0)
+                   + s.small.nbytes + s.rgb.nbytes for s in self.slots)
+
+    def reconfigure(self, capture_size=None, detection_width=None):
+        """
+        Ask for a new camera size and/or detection width. Applied by the
+        next read(), on whichever thread captures, so the camera is only
+        touched by that thread.
+        """
+        self._pending = (capture_size, detection_width)
+
+    def _apply_pending(self, cap):
+        pending, self._pending = self._pending, None
+        capture_size, detection_width = pending
+        if capture_size is not None:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, capture_size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, capture_size[1])
+            # Slots follow whatever size the camera actually delivers next
+        if detection_width is not None and detection_width != self.detection_width:
+            self.detection_width = detection_width
+            self._allocate(*self.size)
+            self.reallocations += 1
+
+    def _acquire(self):
+        """Next free slot, round robin, with one reference; None if all are in use."""
+        with self._lock:
+            for i in range(self.count):
+                slot = self.slots[(self.index + i) % self.count]
+                if slot.refs == 0:
+                    slot.refs = 1
+                    self.index = (self.index + i + 1) % self.count
+                    return slot
+        return None
+
+    def hold(self, slot):
+        """Add a reference to slot for another consumer."""
+        with self._lock:
+            slot.refs += 1
+
+    def release(self, slot):
+        """Drop one reference; the slot is reused once none are left."""
+        with self._lock:
+            slot.refs -= 1
+
+    def read(self, cap, now=None):
+        """
+        Capture into a free slot (cap.read(image=...) reuses it). In image
+        mode the mirrored frame is made right away. now: capture time to
+        record in t_capture. Returns the slot, owned by the caller until it
+        calls release(), or None when nothing was read or no slot was free.
+        """
+        if self._pending is not None:
+            self._apply_pending(cap)
+        slot = self._acquire()
+        if slot is None:
+            # Keep the camera drained: read, and drop the frame
+            if self._scratch is None:
+                self._scratch = np.empty_like(self.slots[0].capture)
+            ret, image = cap.read(self._scratch)
+            if ret and image is not None:
+                self._scratch = image
+                self.dropped += 1
+            return None
+        ret, image = cap.read(slot.capture)
+        if not ret or image is None:
+            self.release(slot)
+            return None
+        if image is not slot.capture:
+            # The camera delivered another size: rebuild the ring for it once
+            h, w = image.shape[:2]
+            self._allocate(w, h)
+            self.reallocations += 1
+            slot = self._acquire()
+            np.copyto(slot.capture, image)
+        slot.t_capture = now
+        slot.mirrored = False
+        if self.mirror == 'image':
+            cv2.flip(slot.capture, 1, dst=slot.frame)
+            slot.mirrored = True
+        return slot
+
+    def detection_input(self, slot):
+        """Detection-size RGB image of the slot, written into its own buffers."""
+        if self.mirror == 'landmarks' and slot.mirrored:
+            raise RuntimeError("detection_input() must run before display() in 'landmarks' mode")
+        src = slot.frame
+        if self.detection_size != self.size:
+            cv2.resize(src, self.detection_size, dst=slot.small)
+            src = slot.small
+        cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=slot.rgb)
+        return slot.rgb
+
+    def display(self, slot):
+        """The slot's frame, mirrored as the mode wants, to draw on and show."""
+        if self.mirror == 'landmarks' and not slot.mirrored:
+            cv2.flip(slot.capture, 1, dst=slot.capture)   # in place: pixels swap within rows
+            slot.mirrored = True
+        return slot.frame
+
+    def landmarks(self, hands):
+        """Detected hands in display coordinates (mirrored in 'landmarks' mode)."""
+        if self.mirror != 'landmarks':
+            return hands
+        return mirror_hands(hands)
+
+
+def mirror_hands(hands):
+    """HandLandmarks for hands flipped horizontally (x -> 1 - x)."""
+    mirrored = []
+    for hand in hands:
+        array = as_array(hand).copy()
+        array[:, 0] = 1.0 - array[:, 0]
+        mirrored.append(HandLandmarks(array))
+    return mirrored
+
+
+class AllocationCounter:
+    """
+    Traced bytes allocated inside track() blocks, from tracemalloc's peak.
+    A block that only writes into existing buffers shows a few dozen bytes
+    (Python tuples); one that allocates an image shows its size. The first
+    warmup blocks are skipped. Debug only: tracing slows every allocation.
+    """
+    def __init__(self, enabled=False, warmup=30, buffer_bytes=1024):
+        self.enabled = enabled
+        self.warmup = warmup
+        self.buffer_bytes = buffer_bytes   # anything larger counts as a buffer allocation
+        self.samples = []
+        self.seen = 0
+
+    def start(self):
+        if self.enabled and not hasattr(tracemalloc, 'reset_peak'):
+            print("⚠ Allocation tracing needs Python 3.9+; disabled")
+            self.enabled = False
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return self
+
+    @contextmanager
+    def track(self):
+        if not self.enabled:
+            yield
+            return
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        yield
+        _, peak = tracemalloc.get_traced_memory()
+        self.seen += 1
+        if self.seen > self.warmup:
+            self.samples.append(peak - before)
+
+    def summary(self, label):
+        if not self.samples:
+            return f"{label}: no samples"
+        samples = np.asarray(self.samples)
+        over = int(np.count_nonzero(samples > self.buffer_bytes))
+        return (f"{label}: median {np.median(samples):.0f} B | max {samples.max()} B per block | "
+                f"{over} of {len(samples)} blocks allocated more than {self.buffer_bytes} B")
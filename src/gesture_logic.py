@@ -2,6 +2,10 @@
 import math
 import time
 
+import numpy as np
+
+from src.landmarks import stack_hands
+
 class GestureState:
     """
     Stabilizer: on_frames needed to activate, off_frames needed to deactivate.
@@ -31,6 +35,8 @@ class ChargeState:
     """
     Handles charge-up mechanics for VFX effects.
     Charges over time, auto-releases at max, animates release.
+    Every method takes an optional now (seconds) so offline rendering can
+    run on frame timestamps; it defaults to time.time().
     """
     def __init__(self, max_charge_time=10.0, release_duration=2.0):
         self.is_charging = False
@@ -41,24 +47,25 @@ class ChargeState:
         self.release_time = None
         self.release_duration = release_duration
         
-    def update(self, is_active):
+    def update(self, is_active, now=None):
         """
         Update charge state based on whether gesture is active.
         Returns: (is_charging, is_releasing, charge_level)
         """
+        now = time.time() if now is None else now
         if is_active:
             if not self.is_charging and not self.is_released:
                 # Start charging
                 self.is_charging = True
-                self.charge_start_time = time.time()
+                self.charge_start_time = now
             elif self.is_charging:
                 # Continue charging
-                elapsed = time.time() - self.charge_start_time
+                elapsed = now - self.charge_start_time
                 self.charge_level = min(1.0, elapsed / self.max_charge_time)
                 
                 # Auto-release at max charge
                 if self.charge_level >= 1.0 and not self.is_released:
-                    self.trigger_release()
+                    self.trigger_release(now)
         else:
             # Gesture stopped
             if not self.is_released:
@@ -66,28 +73,30 @@ class ChargeState:
                 self.reset()
         
         # Check if release animation is finished
-        if self.is_released and not self.is_releasing():
+        if self.is_released and not self.is_releasing(now):
             self.reset()
         
-        return self.is_charging, self.is_releasing(), self.charge_level
+        return self.is_charging, self.is_releasing(now), self.charge_level
     
-    def trigger_release(self):
+    def trigger_release(self, now=None):
         """Trigger the release animation"""
         self.is_released = True
-        self.release_time = time.time()
+        self.release_time = time.time() if now is None else now
         self.is_charging = False
     
-    def is_releasing(self):
+    def is_releasing(self, now=None):
         """Check if currently in release animation"""
         if not self.is_released or self.release_time is None:
             return False
-        return (time.time() - self.release_time) < self.release_duration
+        now = time.time() if now is None else now
+        return (now - self.release_time) < self.release_duration
     
-    def get_release_progress(self):
+    def get_release_progress(self, now=None):
         """Get release animation progress (0.0 to 1.0)"""
-        if not self.is_releasing():
+        now = time.time() if now is None else now
+        if not self.is_releasing(now):
             return 0.0
-        return (time.time() - self.release_time) / self.release_duration
+        return (now - self.release_time) / self.release_duration
     
     def reset(self):
         """Reset charge state"""
@@ -100,16 +109,77 @@ class ChargeState:
 
 # --- Gesture helpers (mediapipe landmarks expected) ---
 
+# Bits in the per-hand masks returned by classify_all()
+INDEX_UP = 1 << 0
+ONLY_INDEX = 1 << 1
+OPEN_PALM = 1 << 2
+FIST = 1 << 3
+PEACE = 1 << 4
+THUMB_UP = 1 << 5
+GOKU_POSE = 1 << 6   # set on both hands when exactly two hands form the pose
+ALL_GESTURES = INDEX_UP | ONLY_INDEX | OPEN_PALM | FIST | PEACE | THUMB_UP | GOKU_POSE
+
+# landmark indices: finger tips and their pip joints (index, middle, ring, pinky)
+_TIPS = [8, 12, 16, 20]
+_PIPS = [6, 10, 14, 18]
+
+
+def classify_all(hands, margin=0.02, frame_w=1, frame_h=1,
+                 palm_distance_ratio=0.18, y_threshold_ratio=0.65, wanted=ALL_GESTURES):
+    """
+    Evaluate every gesture for every hand in one set of NumPy comparisons.
+    hands: list of hands (mediapipe / HandLandmarks) or a (hands, 21, 3) array.
+    frame_w / frame_h only matter for GOKU_POSE, which is measured in pixels.
+    wanted: gesture bits to evaluate (e.g. an EffectRegistry's features);
+    the others stay 0.
+    Returns a uint8 bitmask per hand.
+    """
+    lm = stack_hands(hands)
+    x = lm[:, :, 0]
+    y = lm[:, :, 1]
+    tips = y[:, _TIPS]
+    pips = y[:, _PIPS]
+
+    extended = tips < pips - margin      # tip clearly above pip
+    down = tips > pips - margin          # not clearly above pip
+
+    masks = np.zeros(len(lm), dtype=np.uint8)
+    if wanted & INDEX_UP:
+        masks |= extended[:, 0] * np.uint8(INDEX_UP)
+    if wanted & ONLY_INDEX:
+        thumb_closed = np.abs(x[:, 4] - x[:, 3]) < 0.1  # thumb not extended sideways
+        masks |= (extended[:, 0] & down[:, 1:].all(axis=1) & thumb_closed) * np.uint8(ONLY_INDEX)
+    if wanted & OPEN_PALM:
+        masks |= (~down).all(axis=1) * np.uint8(OPEN_PALM)
+    if wanted & FIST:
+        curled = tips >= pips + margin   # tip clearly below pip
+        masks |= curled.all(axis=1) * np.uint8(FIST)
+    if wanted & PEACE:
+        masks |= (extended[:, 0] & extended[:, 1] & down[:, 2] & down[:, 3]) * np.uint8(PEACE)
+    if wanted & THUMB_UP:
+        masks |= ((y[:, 4] < y[:, 2]) & (y[:, 8] > y[:, 5])) * np.uint8(THUMB_UP)
+
+    if len(lm) == 2 and wanted & GOKU_POSE:
+        # palm center = average of wrist (0) and middle_finger_mcp (9), in pixels
+        palms = (lm[:, 0, :2] + lm[:, 9, :2]) / 2.0 * (frame_w, frame_h)
+        dist = np.hypot(*(palms[0] - palms[1]))
+        avg_y = palms[:, 1].mean()
+        if dist < palm_distance_ratio * frame_w and avg_y < y_threshold_ratio * frame_h:
+            masks |= np.uint8(GOKU_POSE)
+    return masks
+
+
+def _has(hand_landmarks, gesture, margin):
+    return bool(classify_all([hand_landmarks], margin, wanted=gesture)[0] & gesture)
+
+
 def is_index_finger_up(hand_landmarks, margin=0.02):
     """
     Check if index finger is extended (tip above pip).
     hand_landmarks: single-hand landmarks (mediapipe)
     Returns True/False.
     """
-    # landmarks indices: 8 = index_finger_tip, 6 = index_finger_pip
-    tip = hand_landmarks.landmark[8]
-    pip = hand_landmarks.landmark[6]
-    return tip.y < (pip.y - margin)
+    return _has(hand_landmarks, INDEX_UP, margin)
 
 
 def is_only_index_finger_up(hand_landmarks, margin=0.02):
@@ -117,35 +187,7 @@ def is_only_index_finger_up(hand_landmarks, margin=0.02):
     Check if ONLY index finger is extended, all others are down.
     This is more strict - perfect for Freeza beam.
     """
-    # Index finger must be up
-    index_tip = hand_landmarks.landmark[8]
-    index_pip = hand_landmarks.landmark[6]
-    index_up = index_tip.y < (index_pip.y - margin)
-    
-    if not index_up:
-        return False
-    
-    # Middle finger must be down (tip below pip)
-    middle_tip = hand_landmarks.landmark[12]
-    middle_pip = hand_landmarks.landmark[10]
-    middle_down = middle_tip.y > (middle_pip.y - margin)
-    
-    # Ring finger must be down
-    ring_tip = hand_landmarks.landmark[16]
-    ring_pip = hand_landmarks.landmark[14]
-    ring_down = ring_tip.y > (ring_pip.y - margin)
-    
-    # Pinky must be down
-    pinky_tip = hand_landmarks.landmark[20]
-    pinky_pip = hand_landmarks.landmark[18]
-    pinky_down = pinky_tip.y > (pinky_pip.y - margin)
-    
-    # Thumb should be somewhat closed (not extended)
-    thumb_tip = hand_landmarks.landmark[4]
-    thumb_ip = hand_landmarks.landmark[3]
-    thumb_closed = abs(thumb_tip.x - thumb_ip.x) < 0.1  # Thumb not extended sideways
-    
-    return middle_down and ring_down and pinky_down and thumb_closed
+    return _has(hand_landmarks, ONLY_INDEX, margin)
 
 
 def is_open_palm(hand_landmarks, margin=0.02):
@@ -153,21 +195,7 @@ def is_open_palm(hand_landmarks, margin=0.02):
     Check if all fingers are extended (open palm gesture).
     Perfect for: Rasengan, Force Push, Energy Shield, etc.
     """
-    # Check if all 4 main fingers are up
-    fingers = [
-        (8, 6),   # Index
-        (12, 10), # Middle
-        (16, 14), # Ring
-        (20, 18)  # Pinky
-    ]
-    
-    for tip_idx, pip_idx in fingers:
-        tip = hand_landmarks.landmark[tip_idx]
-        pip = hand_landmarks.landmark[pip_idx]
-        if tip.y > (pip.y - margin):  # Finger is down
-            return False
-    
-    return True
+    return _has(hand_landmarks, OPEN_PALM, margin)
 
 
 def is_fist(hand_landmarks, margin=0.02):
@@ -175,21 +203,7 @@ def is_fist(hand_landmarks, margin=0.02):
     Check if all fingers are closed (fist gesture).
     Perfect for: Power charge, Punch effects, Shockwave, etc.
     """
-    # Check if all 4 main fingers are down
-    fingers = [
-        (8, 6),   # Index
-        (12, 10), # Middle
-        (16, 14), # Ring
-        (20, 18)  # Pinky
-    ]
-    
-    for tip_idx, pip_idx in fingers:
-        tip = hand_landmarks.landmark[tip_idx]
-        pip = hand_landmarks.landmark[pip_idx]
-        if tip.y < (pip.y + margin):  # Finger is up
-            return False
-    
-    return True
+    return _has(hand_landmarks, FIST, margin)
 
 
 def is_peace_sign(hand_landmarks, margin=0.02):
@@ -197,27 +211,7 @@ def is_peace_sign(hand_landmarks, margin=0.02):
     Check if index + middle fingers are up, others down.
     Perfect for: Clone Jutsu, Split beam, Double shot, etc.
     """
-    # Index up
-    index_tip = hand_landmarks.landmark[8]
-    index_pip = hand_landmarks.landmark[6]
-    index_up = index_tip.y < (index_pip.y - margin)
-    
-    # Middle up
-    middle_tip = hand_landmarks.landmark[12]
-    middle_pip = hand_landmarks.landmark[10]
-    middle_up = middle_tip.y < (middle_pip.y - margin)
-    
-    # Ring down
-    ring_tip = hand_landmarks.landmark[16]
-    ring_pip = hand_landmarks.landmark[14]
-    ring_down = ring_tip.y > (ring_pip.y - margin)
-    
-    # Pinky down
-    pinky_tip = hand_landmarks.landmark[20]
-    pinky_pip = hand_landmarks.landmark[18]
-    pinky_down = pinky_tip.y > (pinky_pip.y - margin)
-    
-    return index_up and middle_up and ring_down and pinky_down
+    return _has(hand_landmarks, PEACE, margin)
 
 
 def is_thumb_up(hand_landmarks):
@@ -225,20 +219,7 @@ def is_thumb_up(hand_landmarks):
     Check if only thumb is extended upward.
     Perfect for: Approval effect, Boost power, etc.
     """
-    # Thumb tip should be above thumb IP joint
-    thumb_tip = hand_landmarks.landmark[4]
-    thumb_ip = hand_landmarks.landmark[3]
-    thumb_mcp = hand_landmarks.landmark[2]
-    
-    # Thumb extended upward
-    thumb_up = thumb_tip.y < thumb_mcp.y
-    
-    # All other fingers closed
-    index_tip = hand_landmarks.landmark[8]
-    index_mcp = hand_landmarks.landmark[5]
-    fingers_closed = index_tip.y > index_mcp.y
-    
-    return thumb_up and fingers_closed
+    return _has(hand_landmarks, THUMB_UP, 0.02)
 
 
 def get_fingertip_pixel(hand_landmarks, frame_w, frame_h):
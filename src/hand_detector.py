@@ -1,20 +1,163 @@
 # src/hand_detector.py
-import mediapipe as mp
 import math
+import numpy as np
+
+from src.landmarks import HandLandmarks
+
+
+class TrackingResult:
+    """Same shape as the mediapipe results object: .multi_hand_landmarks."""
+    __slots__ = ('multi_hand_landmarks', 'full_frame')
+
+    def __init__(self, multi_hand_landmarks, full_frame):
+        self.multi_hand_landmarks = multi_hand_landmarks
+        self.full_frame = full_frame  # True when this frame ran full-frame detection
+
+
+def landmark_box(landmarks):
+    """Normalized (x1, y1, x2, y2) bounding box of (21, 3) landmarks."""
+    return (float(landmarks[:, 0].min()), float(landmarks[:, 1].min()),
+            float(landmarks[:, 0].max()), float(landmarks[:, 1].max()))
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
 
 class HandDetector:
-    def __init__(self, max_num_hands=2, detection_confidence=0.7, tracking_confidence=0.7):
+    def __init__(self, max_num_hands=2, detection_confidence=0.7, tracking_confidence=0.7,
+                 roi_tracking=False, roi_padding=0.35, full_detect_interval=15,
+                 roi_confidence=0.6, dedup_iou=0.5):
+        """
+        roi_tracking: after a full-frame detection, follow each hand in a
+        padded crop around its previous box. Every hand slot has its own
+        video-mode tracker, so MediaPipe keeps tracking inside the crop and
+        only re-runs palm detection there when it loses the hand (tracking
+        score below roi_confidence). The full-frame model then only sees
+        every few frames, so it runs in static-image mode. A full-frame
+        detect runs again every full_detect_interval frames, or as soon as
+        a crop loses its hand. Hands whose boxes overlap by more than
+        dedup_iou (two crops on one hand) are reported once.
+        """
+        import mediapipe as mp  # slow to import; only paid once a detector is built
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(
+            static_image_mode=roi_tracking,
             max_num_hands=max_num_hands,
             min_detection_confidence=detection_confidence,
             min_tracking_confidence=tracking_confidence
         )
         self.mp_draw = mp.solutions.drawing_utils
 
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.full_detect_interval = full_detect_interval
+        self.dedup_iou = dedup_iou
+        self.roi_hands = []
+        if roi_tracking:
+            # One tracker per hand slot: it sees the same hand every frame
+            self.roi_hands = [
+                self.mp_hands.Hands(
+                    max_num_hands=1,
+                    min_detection_confidence=detection_confidence,
+                    min_tracking_confidence=roi_confidence
+                )
+                for _ in range(max_num_hands)
+            ]
+        self.tracked = []  # (tracker slot, (21, 3) array) from the previous frame
+        self.frames_since_full = 0
+
     def process(self, frame_rgb):
-        """Return mediapipe results object when given RGB frame."""
-        return self.hands.process(frame_rgb)
+        """
+        Return mediapipe results object when given RGB frame.
+        In ROI tracking mode returns a TrackingResult of HandLandmarks instead.
+        """
+        if not self.roi_tracking:
+            return self.hands.process(frame_rgb)
+        return self.track(frame_rgb)
+
+    def track(self, frame_rgb):
+        """ROI-tracking detection; see __init__."""
+        self.frames_since_full += 1
+        if self.tracked and self.frames_since_full < self.full_detect_interval:
+            tracked = self._track_rois(frame_rgb)
+            if tracked is not None:
+                self.tracked = tracked
+                return TrackingResult([HandLandmarks(arr) for _, arr in tracked], full_frame=False)
+
+        results = self.hands.process(frame_rgb)
+        hands = [HandLandmarks.from_mediapipe(hand) for hand in results.multi_hand_landmarks or []]
+        self.tracked = self._assign_slots([hand.array for hand in hands])
+        self.frames_since_full = 0
+        return TrackingResult(hands, full_frame=True)
+
+    def _assign_slots(self, arrays):
+        """
+        Give each freshly detected hand the tracker slot of the previous hand
+        it overlaps most, so every crop tracker keeps following one hand.
+        """
+        previous = [(slot, landmark_box(arr)) for slot, arr in self.tracked]
+        free = [slot for slot in range(len(self.roi_hands))
+                if slot not in {slot for slot, _ in previous}]
+        tracked = []
+        for arr in arrays:
+            box = landmark_box(arr)
+            best = max(previous, key=lambda item: box_iou(box, item[1]), default=None)
+            if best is not None and box_iou(box, best[1]) > 0.0:
+                previous.remove(best)
+                slot = best[0]
+            elif free:
+                slot = free.pop(0)
+            else:
+                slot = previous.pop(0)[0]
+            tracked.append((slot, arr))
+        return tracked
+
+    def roi_box(self, landmarks, width, height):
+        """Padded square pixel box (x1, y1, x2, y2) around (21, 3) landmarks, clipped."""
+        xs = landmarks[:, 0] * width
+        ys = landmarks[:, 1] * height
+        cx = (xs.min() + xs.max()) / 2.0
+        cy = (ys.min() + ys.max()) / 2.0
+        side = max(xs.max() - xs.min(), ys.max() - ys.min()) * (1.0 + 2 * self.roi_padding)
+        half = max(side, 32) / 2.0
+        x1, y1 = max(0, int(cx - half)), max(0, int(cy - half))
+        x2, y2 = min(width, int(cx + half)), min(height, int(cy + half))
+        return x1, y1, x2, y2
+
+    def _track_rois(self, frame_rgb):
+        """(slot, landmarks) for every tracked hand from its crop, or None to force a full detect."""
+        height, width = frame_rgb.shape[:2]
+        tracked = []
+        for slot, previous in self.tracked:
+            x1, y1, x2, y2 = self.roi_box(previous, width, height)
+            if x2 - x1 < 16 or y2 - y1 < 16:
+                return None
+            crop = np.ascontiguousarray(frame_rgb[y1:y2, x1:x2])
+            results = self.roi_hands[slot].process(crop)
+            if not results.multi_hand_landmarks:
+                return None
+
+            # Map crop-normalized coordinates back to the frame
+            crop_w, crop_h = x2 - x1, y2 - y1
+            arr = HandLandmarks.from_mediapipe(results.multi_hand_landmarks[0]).array
+            arr[:, 0] = (arr[:, 0] * crop_w + x1) / width
+            arr[:, 1] = (arr[:, 1] * crop_h + y1) / height
+            arr[:, 2] *= crop_w / width  # z shares the x scale
+
+            # Two crops that converged on the same hand report it once
+            box = landmark_box(arr)
+            if any(box_iou(box, landmark_box(kept)) > self.dedup_iou for _, kept in tracked):
+                continue
+            tracked.append((slot, arr))
+        return tracked
 
     @staticmethod
     def landmark_to_pixel(landmark, width, height):
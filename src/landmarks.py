@@ -0,0 +1,58 @@
+# src/landmarks.py
+import numpy as np
+
+NUM_LANDMARKS = 21
+
+
+class Landmark:
+    """Single landmark with mediapipe-style .x/.y/.z (normalized coordinates)."""
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class HandLandmarks:
+    """
+    One hand's landmarks backed by a (21, 3) float32 array.
+    Exposes .landmark[i].x/.y/.z like mediapipe's NormalizedLandmarkList,
+    so gesture helpers accept either type.
+    """
+    __slots__ = ('array', '_landmark')
+
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32)
+        self._landmark = None
+
+    @classmethod
+    def from_mediapipe(cls, hand_landmarks):
+        return cls([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark])
+
+    @property
+    def landmark(self):
+        if self._landmark is None:
+            self._landmark = [Landmark(float(x), float(y), float(z)) for x, y, z in self.array]
+        return self._landmark
+
+
+def as_array(hand_landmarks):
+    """(21, 3) float32 array for a mediapipe hand, HandLandmarks or array."""
+    if isinstance(hand_landmarks, HandLandmarks):
+        return hand_landmarks.array
+    if isinstance(hand_landmarks, np.ndarray):
+        return hand_landmarks.astype(np.float32, copy=False)
+    return HandLandmarks.from_mediapipe(hand_landmarks).array
+
+
+def stack_hands(hands):
+    """
+    (hands, 21, 3) float32 array for a list of hands (any type as_array
+    accepts). An existing 3-D array passes through untouched.
+    """
+    if isinstance(hands, np.ndarray) and hands.ndim == 3:
+        return hands.astype(np.float32, copy=False)
+    if not hands:
+        return np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32)
+    return np.stack([as_array(hand) for hand in hands])
@@ -0,0 +1,431 @@
+# src/multi_stream.py
+"""
+Several camera / video feeds at once, one worker process per stream.
+
+    python main.py --streams 0 1 booth3.mp4 [--no-window] [--unpaced]
+
+Each stream has:
+  - a capture thread in the runner process that reads straight into a
+    slot of the stream's SharedFrameRing (cap.read(image=...))
+  - a spawned worker process attached to the same ring. It detects hands
+    and composites the effects into the slot in place, with its own
+    gesture / charge / particle state (that state is per process)
+  - a pipe carrying only (slot, seq, t_capture[, worker seconds]) tuples;
+    pixels are never pickled
+
+The runner shows the finished frames (or only counts them with
+--no-window) and reports per-stream FPS and capture-to-composited
+latency. Streams share nothing, so aggregate throughput should grow with
+cores until capture decoding or the display loop becomes the limit. That
+has only been measured with stand-in detectors (compositing alone); with
+real MediaPipe workers, which start their own threads, scaling per core is
+still unmeasured.
+
+Slots cycle free -> captured (worker owns it) -> done (runner owns it)
+-> free. A live source (camera, or a paced file) with no free slot
+reads into a scratch buffer and counts the frame as dropped, so the
+worker always gets the newest frame; an unpaced file waits for a slot
+instead, for throughput measurements.
+"""
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from src.detection_scheduler import DetectionScheduler, LandmarkPredictor
+from src.pipeline import LatencyStats
+from src.utils import attach_shared_memory, detection_size, put_text
+
+# magic, version, slots, height, width
+_HEADER = struct.Struct('<4sIIII')
+_MAGIC = b'ACFR'
+_VERSION = 1
+_DATA_OFFSET = 64  # keep frame data cache-line aligned
+
+
+class SharedFrameRing:
+    """
+    (slots, H, W, 3) uint8 frames in one shared memory segment. The
+    creating process owns (and unlinks) it; workers attach by name.
+    Which process may touch a slot is decided by the messages passed
+    around, not by the ring.
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        magic, version, slots, height, width = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Segment {shm.name} is not a version {_VERSION} frame ring")
+        self.frames = np.ndarray((slots, height, width, 3), dtype=np.uint8,
+                                 buffer=shm.buf, offset=_DATA_OFFSET)
+
+    @classmethod
+    def create(cls, name, slots, height, width):
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=_DATA_OFFSET + slots * height * width * 3)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, slots, height, width)
+        ring = cls(shm, owner=True)
+        atexit.register(ring.unlink)
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        return cls(attach_shared_memory(name), owner=False)
+
+    def __len__(self):
+        return self.frames.shape[0]
+
+    def close(self):
+        self.frames = None   # drop the view before closing the mapping
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        if self.owner:
+            self.owner = False
+            self.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def parse_source(source):
+    """Camera index for digit strings ('0'), the path otherwise."""
+    return int(source) if str(source).isdigit() else source
+
+
+class StreamStats:
+    """Per-stream counters, plus a rolling FPS over the last report interval."""
+    def __init__(self):
+        self.latency = LatencyStats()    # capture -> composited, ms
+        self.work = LatencyStats()       # worker time per frame, ms
+        self.captured = 0
+        self.completed = 0
+        self.dropped = 0                 # captured with no free slot
+        self.superseded = 0              # composited but replaced before display
+        self._mark = (time.perf_counter(), 0)
+        self.fps = 0.0
+
+    def tick(self, now):
+        t0, n0 = self._mark
+        if now - t0 >= 1.0:
+            self.fps = (self.completed - n0) / (now - t0)
+            self._mark = (now, self.completed)
+
+
+class Stream:
+    def __init__(self, index, source, cap, ring, slots):
+        self.index = index
+        self.source = source
+        self.title = f"AnimeCast LIVE [{index}] {source}"
+        self.cap = cap
+        self.ring = ring
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+        self.lock = threading.Lock()
+        self.ready = None        # newest composited slot waiting for display
+        self.shown = None        # slot currently on screen
+        self.conn = None
+        self.process = None
+        self.capture_thread = None
+        self.result_thread = None
+        self.finished = False    # worker said goodbye (source ended or stopped)
+        self.stats = StreamStats()
+        self.fps = cap.get(cv2.CAP_PROP_FPS) if isinstance(source, str) else 0.0
+
+    @property
+    def live(self):
+        return not isinstance(self.source, str)
+
+
+def stream_worker(ring_name, conn, renderer, mirror=False, track=False, detector_factory=None,
+                  detection_width=640, target_fps=30, min_detection_hz=10):
+    """
+    Worker process for one stream. Receives (slot, seq, t_capture) for
+    frames the runner captured into the shared ring, detects hands
+    (scheduled and extrapolated as in the serial loop) and composites the
+    effects into the slot in place, then answers (slot, seq, t_capture,
+    worker seconds). None ends the stream. The effect states are this
+    process's own, so every stream charges independently.
+    renderer: module-level callable returning render(frame, hands)
+    (main.frame_renderer). detector_factory: module-level callable
+    building the detector (default: HandDetector).
+    """
+    ring = SharedFrameRing.attach(ring_name)
+    try:
+        if detector_factory is None:
+            from src.hand_detector import HandDetector
+            detector = HandDetector(max_num_hands=2, roi_tracking=track)
+        else:
+            detector = detector_factory()
+        render = renderer()
+    except Exception as e:
+        conn.send(('error', repr(e)))
+        raise
+    h, w = ring.frames.shape[1:3]
+    dw, dh = detection_size(w, h, detection_width)
+    small = np.empty((dh, dw, 3), dtype=np.uint8)
+    rgb = np.empty_like(small)
+    scheduler = DetectionScheduler(target_fps=target_fps, min_hz=min_detection_hz)
+    predictor = LandmarkPredictor()
+    conn.send(('ready', os.getpid()))
+
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            slot, seq, t_capture = message
+            t0 = time.perf_counter()
+            frame = ring.frames[slot]
+            if mirror:
+                cv2.flip(frame, 1, dst=frame)
+            if scheduler.should_detect(t0):
+                src = frame
+                if (dw, dh) != (w, h):
+                    src = cv2.resize(frame, (dw, dh), dst=small)
+                cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=rgb)
+                t_detect = time.perf_counter()
+                results = detector.process(rgb)
+                scheduler.record(time.perf_counter() - t_detect, t0)
+                predictor.update(results.multi_hand_landmarks or [], t0)
+            render(frame, predictor.predict(t0))
+            conn.send((slot, seq, t_capture, time.perf_counter() - t0))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        try:
+            conn.send(None)
+        except (OSError, ValueError):
+            pass
+        ring.close()
+
+
+class StreamRunner:
+    """
+    Runs sources (camera indices or video paths) in parallel. worker is a
+    module-level function called in each spawned process as
+    worker(ring_name, conn, mirror=..., **worker_kwargs); see
+    stream_worker for the protocol.
+    """
+    def __init__(self, sources, worker, worker_kwargs=None, slots=4, display=True, paced=True,
+                 mirror_cameras=True, mirror_files=False, capture_size=(640, 480), report_every=5.0):
+        self.sources = [parse_source(s) for s in sources]
+        self.worker = worker
+        self.worker_kwargs = worker_kwargs or {}
+        self.slots = slots
+        self.display = display
+        self.paced = paced
+        self.mirror_cameras = mirror_cameras
+        self.mirror_files = mirror_files
+        self.capture_size = capture_size
+        self.report_every = report_every
+        self.streams = []
+        self.running = False
+        self.started_at = None
+
+    # ---------- setup ----------
+
+    def _open(self, index, source):
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open stream source {source!r}")
+        if not isinstance(source, str):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_size[1])
+        ret, first = cap.read()
+        if not ret:
+            raise ValueError(f"No frames from stream source {source!r}")
+        if isinstance(source, str):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        h, w = first.shape[:2]
+        ring = SharedFrameRing.create(f"animecast_stream_{os.getpid()}_{index}", self.slots, h, w)
+        return Stream(index, source, cap, ring, self.slots)
+
+    def start(self, ctx):
+        """Open every source, spawn the workers (ctx: multiprocessing context) and wait until they are ready."""
+        for index, source in enumerate(self.sources):
+            self.streams.append(self._open(index, source))
+        for stream in self.streams:
+            parent, child = ctx.Pipe()
+            mirror = self.mirror_cameras if stream.live else self.mirror_files
+            stream.conn = parent
+            stream.process = ctx.Process(target=self.worker, name=f"stream-{stream.index}",
+                                         args=(stream.ring.name, child),
+                                         kwargs=dict(self.worker_kwargs, mirror=mirror), daemon=True)
+            stream.process.start()
+            child.close()
+        for stream in self.streams:
+            # Workers load MediaPipe and the sprites in parallel; wait for all of them
+            message = stream.conn.recv()
+            if message[0] != 'ready':
+                raise RuntimeError(f"Stream {stream.index} worker failed to start: {message!r}")
+            h, w = stream.ring.frames.shape[1:3]
+            kind = 'camera' if stream.live else f"file @ {stream.fps:.0f} fps"
+            print(f"✓ Stream {stream.index}: {stream.source} ({kind}, {w}x{h}) -> worker pid {message[1]}")
+
+        self.running = True
+        self.started_at = time.perf_counter()
+        for stream in self.streams:
+            stream.capture_thread = threading.Thread(target=self._capture, args=(stream,),
+                                                     name=f"capture-{stream.index}", daemon=True)
+            stream.result_thread = threading.Thread(target=self._results, args=(stream,),
+                                                    name=f"results-{stream.index}", daemon=True)
+            stream.capture_thread.start()
+            stream.result_thread.start()
+        return self
+
+    # ---------- per-stream threads ----------
+
+    def _capture(self, stream):
+        ring, cap, stats = stream.ring, stream.cap, stream.stats
+        scratch = np.empty_like(ring.frames[0])
+        period = 1.0 / stream.fps if (self.paced and not stream.live and stream.fps > 0) else 0.0
+        live = stream.live or period > 0
+        next_due = time.perf_counter()
+        seq = 0
+        try:
+            while self.running:
+                if period:
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_due += period
+                try:
+                    slot = stream.free.get_nowait() if live else stream.free.get(timeout=0.5)
+                except queue.Empty:
+                    slot = None
+                if slot is None:
+                    if not live:
+                        continue
+                    # Keep the camera drained: read, and drop the frame
+                    ret, _ = cap.read(scratch)
+                    if not ret:
+                        break
+                    stats.dropped += 1
+                    continue
+                dst = ring.frames[slot]   # indexing makes a new view; keep this one to compare
+                ret, image = cap.read(dst)
+                t_capture = time.perf_counter()
+                if not ret:
+                    stream.free.put(slot)
+                    break
+                if image is not dst:
+                    # The source delivered another size than the ring's
+                    np.copyto(dst, cv2.resize(image, ring.frames.shape[2:0:-1]))
+                seq += 1
+                stats.captured += 1
+                stream.conn.send((slot, seq, t_capture))
+        finally:
+            # Tells the worker to finish; it answers with None once done
+            try:
+                stream.conn.send(None)
+            except (OSError, ValueError):
+                pass
+
+    def _results(self, stream):
+        stats = stream.stats
+        while True:
+            try:
+                message = stream.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+            slot, _, t_capture, work = message
+            now = time.perf_counter()
+            stats.latency.add(now - t_capture)
+            stats.work.add(work)
+            stats.completed += 1
+            stats.tick(now)
+            if not self.display:
+                stream.free.put(slot)
+                continue
+            with stream.lock:
+                old, stream.ready = stream.ready, slot
+            if old is not None:
+                stats.superseded += 1
+                stream.free.put(old)
+        stream.finished = True
+
+    # ---------- runner loop ----------
+
+    def run(self):
+        """Show or count frames until Esc / Ctrl+C or every stream has ended."""
+        last_report = time.perf_counter()
+        try:
+            while not all(stream.finished for stream in self.streams):
+                if self.display:
+                    for stream in self.streams:
+                        self._show(stream)
+                    if cv2.waitKey(1) & 0xFF == 27:
+                        break
+                else:
+                    time.sleep(0.05)
+                now = time.perf_counter()
+                if self.report_every and now - last_report >= self.report_every:
+                    print(self.report())
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+        print(self.report(final=True))
+
+    def _show(self, stream):
+        with stream.lock:
+            slot, stream.ready = stream.ready, None
+        if slot is None:
+            return
+        frame = stream.ring.frames[slot]
+        p95 = stream.stats.latency.percentiles((95,))[95]
+        put_text(frame, f"[{stream.index}] FPS {stream.stats.fps:.0f} | p95 {p95:.0f} ms", (10, 30),
+                 color=(0, 255, 255), scale=0.7)
+        cv2.imshow(stream.title, frame)
+        if stream.shown is not None:
+            stream.free.put(stream.shown)
+        stream.shown = slot
+
+    def stop(self):
+        self.running = False
+        for stream in self.streams:
+            if stream.capture_thread is not None:
+                stream.capture_thread.join(timeout=2.0)
+            if stream.result_thread is not None:
+                stream.result_thread.join(timeout=5.0)
+            if stream.process is not None:
+                stream.process.join(timeout=5.0)
+                if stream.process.is_alive():
+                    stream.process.terminate()
+            stream.cap.release()
+            stream.ring.unlink()
+        if self.display:
+            cv2.destroyAllWindows()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started_at
+        lines = [f"{'Streams' if not final else 'Streams (final)'} after {elapsed:.1f} s:"]
+        total = 0
+        for stream in self.streams:
+            s = stream.stats
+            p = s.latency.percentiles()
+            fps = s.completed / elapsed if final else s.fps
+            total += s.completed
+            lines.append(f"  [{stream.index}] {str(stream.source)[:24]:<24} {fps:>5.1f} fps | "
+                         f"latency p50 {p[50]:.1f} / p95 {p[95]:.1f} ms | "
+                         f"worker p50 {s.work.percentiles((50,))[50]:.1f} ms | "
+                         f"{s.completed} done, {s.dropped} dropped, {s.superseded} superseded")
+        lines.append(f"  total {total / elapsed:.1f} frames/s on {len(self.streams)} streams "
+                     f"({os.cpu_count() or 1} cores)")
+        return "\n".join(lines)
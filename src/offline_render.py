@@ -0,0 +1,240 @@
+# src/offline_render.py
+import copy
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.landmarks import HandLandmarks, as_array
+from src.utils import detection_size
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+class FrameSource:
+    """
+    Frames of a video file or an image directory (sorted by name), with
+    timestamps. Timestamps are index / fps, so any chunk of the input can
+    be read on its own and still agree with every other chunk.
+    """
+    def __init__(self, path, fps=30.0):
+        self.path = path
+        self.images = None
+        if os.path.isdir(path):
+            self.images = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.images:
+                raise ValueError(f"No images in {path}")
+            self.fps = fps
+            self.count = len(self.images)
+            first = cv2.imread(os.path.join(path, self.images[0]))
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise ValueError(f"Cannot open video {path}")
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or fps
+            self.count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            _, first = cap.read()
+            cap.release()
+        if first is None:
+            raise ValueError(f"Cannot read frames from {path}")
+        self.height, self.width = first.shape[:2]
+
+    def timestamp(self, index):
+        return index / self.fps
+
+    def frames(self, start=0, end=None):
+        """Yield (index, frame, t) for start <= index < end (end=None: to the last frame)."""
+        end = self.count if end is None else end
+        if self.images is not None:
+            for index in range(start, min(end, self.count)):
+                frame = cv2.imread(os.path.join(self.path, self.images[index]))
+                if frame is not None:
+                    yield index, frame, self.timestamp(index)
+            return
+
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            index = start
+            while index < end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield index, frame, self.timestamp(index)
+                index += 1
+        finally:
+            cap.release()
+
+
+def plan_chunks(count, workers, min_frames=30):
+    """[(start, end), ...] covering count frames, about two chunks per worker."""
+    chunks = max(1, min(workers * 2, count // max(1, min_frames)))
+    bounds = np.linspace(0, count, chunks + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+class NullCompositor:
+    """
+    Stands in for both the VFXEngine and the SpriteCache when only the
+    gesture and charge states need to advance: nothing is rendered.
+    """
+    def get(self, *args):
+        return None
+
+    def get_animated(self, *args):
+        return None, 1.0
+
+    def overlay_batch(self, frame, instances):
+        return frame
+
+    def draw_particles(self, frame, particles):
+        return frame
+
+
+def detect_chunk(path, fps, start, end, mirror=False, detection_width=640, track=False):
+    """
+    Hand landmarks for frames [start, end) of an input, one (hands, 21, 3)
+    float32 array per frame. Runs in a worker process; each chunk starts
+    its own detector, so tracking warms up again on the chunk's first frame.
+    """
+    from src.hand_detector import HandDetector
+    detector = HandDetector(max_num_hands=2, roi_tracking=track)
+    landmarks = []
+    for _, frame, _ in FrameSource(path, fps).frames(start, end):
+        if mirror:
+            frame = cv2.flip(frame, 1)
+        h, w = frame.shape[:2]
+        size = detection_size(w, h, detection_width)
+        small = cv2.resize(frame, size) if size != (w, h) else frame
+        results = detector.process(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        hands = results.multi_hand_landmarks or []
+        landmarks.append(np.stack([as_array(hand) for hand in hands]) if hands
+                         else np.empty((0, 21, 3), dtype=np.float32))
+    return landmarks
+
+
+def open_writer(path, fps, width, height):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open video writer for {path}")
+    return writer
+
+
+def concat_videos(paths, output, fps, width, height):
+    """
+    Join chunk videos in order. Uses ffmpeg's concat demuxer (no
+    re-encode) when ffmpeg is installed, otherwise decodes and re-encodes.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+            for path in paths:
+                listing.write(f"file '{os.path.abspath(path)}'\n")
+        try:
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                            '-i', listing.name, '-c', 'copy', output], check=True)
+        finally:
+            os.unlink(listing.name)
+        return
+
+    writer = open_writer(output, fps, width, height)
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+    finally:
+        writer.release()
+
+
+def hands_of(landmarks):
+    """HandLandmarks list for one frame's (hands, 21, 3) array."""
+    return [HandLandmarks(hand) for hand in landmarks]
+
+
+def render_chunk(path, fps, start, end, mirror, states, landmarks, out_path, renderer):
+    """
+    Worker process: composite frames [start, end) into out_path, starting
+    from the effect states the sequential replay recorded at start.
+    renderer: module-level callable returning render(frame, hands, now,
+    states) (main.frame_renderer).
+    """
+    render = renderer()
+    source = FrameSource(path, fps)
+    writer = open_writer(out_path, source.fps, source.width, source.height)
+    written = 0
+    try:
+        for (_, frame, t), hands in zip(source.frames(start, end), landmarks):
+            if mirror:
+                frame = cv2.flip(frame, 1)
+            writer.write(render(frame, hands_of(hands), now=t, states=states))
+            written += 1
+    finally:
+        writer.release()
+    return written
+
+
+def render_offline(source, output, workers, renderer, new_states, mirror=False, track=False,
+                   detection_width=640):
+    """
+    Offline render of a FrameSource to an encoded video, in three passes:
+      1. hand detection, chunks in parallel worker processes
+      2. gesture and charge states replayed over all frames in order (no
+         compositing, so it is fast), snapshotting the states at every
+         chunk start
+      3. compositing, chunks in parallel, each from its snapshot
+    Charge and spin run on frame timestamps, so the output matches a live
+    run at the input's frame rate regardless of how fast this renders.
+    renderer(compositing=True) builds the per-frame render function in
+    each worker (it must be module-level so it pickles); new_states()
+    returns fresh effect states.
+    """
+    chunks = plan_chunks(source.count, workers)
+    print(f"⚡ Rendering {source.count} frames ({source.width}x{source.height} @ {source.fps:.1f} fps) "
+          f"in {len(chunks)} chunks on {workers} workers")
+
+    # Spawned workers: forking a process that already holds OpenCV/MediaPipe threads can hang
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    with pool, tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        detections = list(pool.map(detect_chunk, *zip(*[
+            (source.path, source.fps, start, end, mirror, detection_width, track)
+            for start, end in chunks])))
+        t_detect = time.perf_counter() - t0
+
+        # Chunk-boundary state: one sequential pass of the gesture logic alone
+        replay = renderer(compositing=False)
+        states = new_states()
+        blank = np.zeros((source.height, source.width, 3), dtype=np.uint8)
+        snapshots = []
+        for (start, _), landmarks in zip(chunks, detections):
+            snapshots.append(copy.deepcopy(states))
+            for offset, hands in enumerate(landmarks):
+                replay(blank, hands_of(hands), now=source.timestamp(start + offset), states=states)
+        t_replay = time.perf_counter() - t0 - t_detect
+
+        parts = [os.path.join(tmp, f"chunk_{i:04d}.mp4") for i in range(len(chunks))]
+        written = sum(pool.map(render_chunk, *zip(*[
+            (source.path, source.fps, start, end, mirror, states, landmarks, part, renderer)
+            for (start, end), states, landmarks, part in zip(chunks, snapshots, detections, parts)])))
+        t_render = time.perf_counter() - t0 - t_detect - t_replay
+
+        concat_videos(parts, output, source.fps, source.width, source.height)
+        total = time.perf_counter() - t0
+
+    duration = source.count / source.fps
+    print(f"✓ Wrote {written} frames to {output} in {total:.1f} s "
+          f"({duration / total:.1f}x real time)")
+    print(f"  detect {t_detect:.1f} s | replay {t_replay:.2f} s | render {t_render:.1f} s | "
+          f"join {total - t_detect - t_replay - t_render:.1f} s")
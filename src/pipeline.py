@@ -0,0 +1,200 @@
+# src/pipeline.py
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.frame_ring import FrameRing
+
+
+class LatestSlot:
+    """
+    Single-item, latest-wins handoff between threads.
+    put() never blocks: an unread item is replaced and counted as dropped,
+    and passed to on_drop (e.g. to release its FrameRing slot).
+    """
+    def __init__(self, on_drop=None):
+        self.on_drop = on_drop
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self._read_seq = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._seq != self._read_seq:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(self._item)
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Wait for an item newer than the last one returned. None once closed or on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq != self._read_seq or self.closed, timeout):
+                return None
+            if self._seq == self._read_seq:
+                return None
+            self._read_seq = self._seq
+            return self._item
+
+    def peek(self):
+        """Newest item without waiting or consuming it (None if nothing yet)."""
+        with self._cond:
+            return self._item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class LatencyStats:
+    """Rolling window of latency samples in milliseconds."""
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds * 1000.0)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        if not self.samples:
+            return {q: 0.0 for q in qs}
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), qs)
+        return dict(zip(qs, values))
+
+    def summary(self, label):
+        p = self.percentiles()
+        return f"{label}: p50 {p[50]:.1f} ms | p95 {p[95]:.1f} ms | p99 {p[99]:.1f} ms ({len(self.samples)} samples)"
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads the camera as fast as it delivers into a FrameRing, which mirrors
+    each frame and makes the detection-size RGB copy (detection_width wide,
+    same aspect ratio) in its preallocated slots. Publishes (slot,
+    t_capture) to the renderer and to the detector, each holding its own
+    reference to the slot until it releases it to the ring.
+    """
+    def __init__(self, cap, ring, frames, detect_frames, timers):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.ring = ring
+        self.frames = frames
+        self.detect_frames = detect_frames
+        self.timers = timers
+        self.running = True
+        self.error = None   # the exception that stopped the thread, if any
+
+    def run(self):
+        timers, ring = self.timers, self.ring
+        try:
+            while self.running:
+                with timers.stage('capture'):
+                    slot = ring.read(self.cap)
+                t_capture = time.perf_counter()
+                if slot is None:
+                    continue
+                # The renderer draws on frame, so the detector always gets the slot's own RGB copy
+                with timers.stage('detect_input'):
+                    ring.detection_input(slot)
+                ring.hold(slot)
+                self.detect_frames.put((slot, t_capture))
+                with timers.stage('flip'):
+                    ring.display(slot)
+                self.frames.put((slot, t_capture))   # hands over read()'s reference
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            # Wake the renderer and the detector so they see the end
+            self.frames.close()
+            self.detect_frames.close()
+
+
+class DetectionWorker(threading.Thread):
+    """
+    Runs HandDetector on the newest detection frame and publishes
+    (hands, t_capture) so the renderer can pair it with newer frames.
+    """
+    def __init__(self, detector, ring, detect_frames, landmarks, timers):
+        super().__init__(name="detection", daemon=True)
+        self.detector = detector
+        self.ring = ring
+        self.detect_frames = detect_frames
+        self.landmarks = landmarks
+        self.timers = timers
+        self.detections = 0
+
+    def run(self):
+        timers = self.timers
+        while True:
+            item = self.detect_frames.get()
+            if item is None:
+                break
+            slot, t_capture = item
+            with timers.stage('detect'):
+                results = self.detector.process(slot.rgb)
+            self.ring.release(slot)
+            self.landmarks.put((self.ring.landmarks(results.multi_hand_landmarks or []), t_capture))
+            self.detections += 1
+
+
+class CapturePipeline:
+    """
+    Capture thread -> detection worker -> render loop, joined by
+    latest-wins slots so the renderer always draws the newest frame with
+    the newest landmarks available, never a backlog.
+    """
+    def __init__(self, cap, detector, detection_width, timers=None, ring=None):
+        """
+        timers: StageTimers for the capture and detection stages (optional).
+        ring: FrameRing to capture into; by default a 640x480 one with 5
+        slots (it resizes itself once if the camera delivers another size).
+        """
+        if timers is None:
+            from src.stage_timer import StageTimers
+            timers = StageTimers(enabled=False)
+        if ring is None:
+            ring = FrameRing(detection_width=detection_width, slots=5)
+        self.ring = ring
+
+        def release(item):
+            ring.release(item[0])
+        self.frames = LatestSlot(on_drop=release)
+        self.detect_frames = LatestSlot(on_drop=release)
+        self.landmarks = LatestSlot()
+        self.capture = CaptureThread(cap, ring, self.frames, self.detect_frames, timers)
+        self.detection = DetectionWorker(detector, ring, self.detect_frames, self.landmarks, timers)
+
+    def start(self):
+        self.capture.start()
+        self.detection.start()
+        return self
+
+    def next_frame(self, timeout=1.0):
+        """
+        (slot, t_capture) of the newest captured frame, or None. Draw on
+        slot.frame, then give the slot back with ring.release(slot).
+        """
+        return self.frames.get(timeout)
+
+    @property
+    def capturing(self):
+        """False once the capture thread has stopped (see capture.error)."""
+        return self.capture.is_alive()
+
+    def latest_hands(self):
+        """(hands, t_capture of the frame they were detected on)."""
+        return self.landmarks.peek() or ([], None)
+
+    def stop(self):
+        self.capture.running = False
+        self.capture.join(timeout=2.0)
+        self.detect_frames.close()
+        self.detection.join(timeout=2.0)
@@ -0,0 +1,131 @@
+# src/quality_governor.py
+"""
+Runtime quality tiers for the live loop.
+
+A QualityTier bundles every knob that trades looks for frame time:
+capture resolution, detection width (height follows the capture aspect,
+see utils.detection_size), detection cadence (DetectionScheduler share of
+the frame budget and minimum rate), sprite rotation quantization
+(SpriteCache steps) and particle density. QualityGovernor watches the
+per-frame processing time against the target FPS and steps one tier down
+when the median frame is over budget, or one tier up when it has plenty
+of headroom.
+
+Hysteresis keeps it from oscillating:
+  - the down and up thresholds are far apart (100% vs 60% of the budget)
+  - every change restarts the measurement window and waits cooldown
+    seconds before the next one
+  - an upgrade that has to be undone soon after doubles the wait before
+    the next upgrade (up to max_upgrade_hold)
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+
+class QualityTier:
+    __slots__ = ('name', 'capture_size', 'detection_width', 'detect_share', 'min_detection_hz',
+                 'rotation_steps', 'particle_density')
+
+    def __init__(self, name, capture_size, detection_width, detect_share, min_detection_hz,
+                 rotation_steps, particle_density):
+        self.name = name
+        self.capture_size = capture_size            # (width, height) asked of the camera
+        self.detection_width = detection_width
+        self.detect_share = detect_share            # DetectionScheduler frame-budget share
+        self.min_detection_hz = min_detection_hz
+        self.rotation_steps = rotation_steps        # SpriteCache angle buckets per turn
+        self.particle_density = particle_density    # multiplies effect particle emission
+
+    def __repr__(self):
+        w, h = self.capture_size
+        return (f"{self.name} ({w}x{h}, detect {self.detection_width}w, "
+                f"{self.rotation_steps} rotations, particles x{self.particle_density:g})")
+
+
+# Best first. 'high' is the classic fixed configuration.
+QUALITY_TIERS = (
+    QualityTier('ultra', (1280, 720), 640, 0.6, 15, 72, 1.0),
+    QualityTier('high', (640, 480), 640, 0.5, 10, 72, 1.0),
+    QualityTier('medium', (640, 480), 480, 0.4, 10, 48, 0.6),
+    QualityTier('low', (640, 480), 320, 0.3, 8, 36, 0.35),
+    QualityTier('minimal', (320, 240), 256, 0.25, 6, 24, 0.2),
+)
+TIER_NAMES = tuple(tier.name for tier in QUALITY_TIERS)
+
+
+def tier_by_name(name, tiers=QUALITY_TIERS):
+    for tier in tiers:
+        if tier.name == name:
+            return tier
+    raise ValueError(f"Unknown quality tier {name!r}; expected one of {[t.name for t in tiers]}")
+
+
+class QualityGovernor:
+    """
+    Picks the tier from measured frame times. Call add() once per frame;
+    it returns the new tier when it changed (after calling on_change), else
+    None.
+    """
+    def __init__(self, tiers=QUALITY_TIERS, start='high', target_fps=30, window=45,
+                 downgrade_at=1.0, upgrade_at=0.6, cooldown=2.0, max_upgrade_hold=60.0,
+                 on_change=None, log=print):
+        self.tiers = tuple(tiers)
+        self.index = self.tiers.index(tier_by_name(start, self.tiers))
+        self.budget = 1.0 / target_fps
+        self.samples = deque(maxlen=window)
+        self.downgrade_at = downgrade_at
+        self.upgrade_at = upgrade_at
+        self.cooldown = cooldown
+        self.upgrade_hold = cooldown * 2
+        self.max_upgrade_hold = max_upgrade_hold
+        self.on_change = on_change
+        self.log = log
+        self.changed_at = None
+        self.last_step = 0            # +1 after a downgrade, -1 after an upgrade
+        self.changes = []             # (time, from name, to name, median frame ms)
+
+    @property
+    def tier(self):
+        return self.tiers[self.index]
+
+    def add(self, frame_seconds, now=None):
+        """Record one frame's processing time (seconds, excluding waiting for the camera)."""
+        now = time.perf_counter() if now is None else now
+        self.samples.append(frame_seconds)
+        if len(self.samples) < self.samples.maxlen:
+            return None
+        since = None if self.changed_at is None else now - self.changed_at
+        if since is not None and since < self.cooldown:
+            return None
+
+        median = float(np.median(np.fromiter(self.samples, dtype=np.float64)))
+        if median > self.budget * self.downgrade_at and self.index < len(self.tiers) - 1:
+            if self.last_step < 0 and since is not None and since < self.upgrade_hold:
+                # The last upgrade did not hold: wait longer before trying again
+                self.upgrade_hold = min(self.max_upgrade_hold, self.upgrade_hold * 2)
+            return self._move(+1, now, median)
+        if (median < self.budget * self.upgrade_at and self.index > 0
+                and (since is None or since >= self.upgrade_hold)):
+            return self._move(-1, now, median)
+        return None
+
+    def _move(self, step, now, median):
+        old = self.tier
+        self.index += step
+        self.last_step = step
+        self.changed_at = now
+        self.samples.clear()   # judge the new tier on its own frames
+        self.changes.append((now, old.name, self.tier.name, median * 1000.0))
+        if self.log is not None:
+            direction = "down" if step > 0 else "up"
+            self.log(f"⚙ Quality {direction}: {old.name} -> {self.tier!r} "
+                     f"(median frame {median * 1000.0:.1f} ms, budget {self.budget * 1000.0:.1f} ms)")
+        if self.on_change is not None:
+            self.on_change(self.tier)
+        return self.tier
+
+    def summary(self):
+        return (f"Quality: {self.tier.name} at exit, {len(self.changes)} tier changes "
+                f"(upgrade hold {self.upgrade_hold:.0f} s)")
@@ -0,0 +1,95 @@
+# src/render_pool.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.pipeline import LatencyStats
+
+
+def render_frame(vfx, jpeg, sprite=None, center_xy=(0, 0), scale=1.0, quality=70):
+    """
+    Decode a JPEG, composite one sprite onto it and re-encode.
+    sprite: BGRA array / PreparedSprite already picked for this frame's
+    angle, or None to return the frame without an effect.
+    Returns JPEG bytes, or None if the upload could not be decoded.
+    """
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+    if sprite is not None:
+        vfx.overlay_png(frame, sprite, center_xy, scale)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes() if ok else None
+
+
+class RenderPool:
+    """
+    Bounded pool for CPU-heavy frame work (JPEG decode, composite, encode).
+    OpenCV and the NumPy blend release the GIL, so OS threads render in
+    parallel while the caller's event loop keeps serving other clients.
+
+    run() blocks only the calling green thread / thread. When max_pending
+    jobs are already queued or running it returns None immediately instead
+    of queueing, and counts the frame as dropped: a late rendered frame is
+    worth less than the next one.
+    """
+    def __init__(self, workers=2, max_pending=None, execute=None):
+        """
+        execute: callable(fn, *args) -> result that runs fn off the calling
+        thread, e.g. eventlet.tpool.execute. Defaults to a private
+        ThreadPoolExecutor with `workers` threads.
+        """
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self.executor = None
+        if execute is None:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+            execute = lambda fn, *args: self.executor.submit(fn, *args).result()
+        self.execute = execute
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.latency = LatencyStats()
+        self.started = time.perf_counter()
+
+    def run(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return None
+            self.pending += 1
+        t0 = time.perf_counter()
+        try:
+            result = self.execute(fn, *args)
+        finally:
+            with self.lock:
+                self.pending -= 1
+        self.rendered += 1
+        self.latency.add(time.perf_counter() - t0)
+        return result
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        p = self.latency.percentiles()
+        return {
+            'rendered': self.rendered,
+            'dropped': self.dropped,
+            'fps': self.rendered / elapsed,
+            'fps_per_worker': self.rendered / elapsed / self.workers,
+            'p50_ms': p[50],
+            'p99_ms': p[99],
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Render pool: {s['rendered']} frames ({s['dropped']} dropped) | "
+                f"{s['fps']:.1f} fps, {s['fps_per_worker']:.1f} fps/worker | "
+                f"p50 {s['p50_ms']:.1f} ms | p99 {s['p99_ms']:.1f} ms")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
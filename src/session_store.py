@@ -0,0 +1,340 @@
+# src/session_store.py
+import atexit
+import math
+import os
+import struct
+import tempfile
+import time
+import zlib
+from abc import ABC, abstractmethod
+from multiprocessing import shared_memory
+
+try:
+    import fcntl
+except ImportError:   # Windows: only the in-process store is available
+    fcntl = None
+
+from src.utils import attach_shared_memory
+
+
+class SessionState:
+    """
+    Per-client effect state: spin angles and Spirit Bomb charge, plus what
+    was last sent to clients in event mode (see src/effect_events.py).
+    """
+    __slots__ = ('rasengan_angle', 'freeza_angle', 'goku_angle', 'charge_start', 'charge_level',
+                 'events', 'effect', 'effect_start', 'sent_x', 'sent_y', 'milestone')
+    FIELDS = __slots__
+    NULLABLE = ('charge_start', 'effect_start')
+
+    def __init__(self, rasengan_angle=0.0, freeza_angle=0.0, goku_angle=0.0,
+                 charge_start=None, charge_level=0.0, events=0, effect=0,
+                 effect_start=None, sent_x=0.0, sent_y=0.0, milestone=0):
+        self.rasengan_angle = rasengan_angle
+        self.freeza_angle = freeza_angle
+        self.goku_angle = goku_angle
+        self.charge_start = charge_start   # time.time() when charging began, or None
+        self.charge_level = charge_level
+        self.events = events               # 1 if the client asked for event mode
+        self.effect = effect               # effect code last announced (0 = none)
+        self.effect_start = effect_start   # time.time() of that effect's start event
+        self.sent_x = sent_x               # position last announced
+        self.sent_y = sent_y
+        self.milestone = milestone         # charge milestones already announced
+
+    def reset_charge(self):
+        self.charge_start = None
+        self.charge_level = 0.0
+
+
+class SessionStore(ABC):
+    """
+    Interface for per-sid session storage. get() returns a SessionState the
+    caller may mutate; save() must be called for the change to persist
+    (backends that hand out live objects treat it as a no-op).
+    """
+    @abstractmethod
+    def create(self, sid):
+        """Store and return a fresh SessionState for sid."""
+
+    @abstractmethod
+    def get(self, sid):
+        """SessionState for sid, or None."""
+
+    @abstractmethod
+    def save(self, sid, state):
+        """Persist a state returned by get() or create()."""
+
+    @abstractmethod
+    def delete(self, sid):
+        """Forget sid (no error if unknown)."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of stored sessions."""
+
+    def get_or_create(self, sid):
+        state = self.get(sid)
+        return state if state is not None else self.create(sid)
+
+
+class LocalSessionStore(SessionStore):
+    """In-process dict of live SessionState objects."""
+    def __init__(self):
+        self.sessions = {}
+
+    def create(self, sid):
+        state = self.sessions[sid] = SessionState()
+        return state
+
+    def get(self, sid):
+        return self.sessions.get(sid)
+
+    def save(self, sid, state):
+        self.sessions[sid] = state
+
+    def delete(self, sid):
+        self.sessions.pop(sid, None)
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+# Segment layout: header, then capacity fixed-size slots
+_HEADER = struct.Struct('<4sIIII')         # magic, version, capacity, ready flag, attached processes
+_SLOT = struct.Struct('<I36s11d')          # status, sid, SessionState fields
+_MAGIC = b'ACSS'
+_VERSION = 3
+_NULLABLE = [SessionState.FIELDS.index(field) for field in SessionState.NULLABLE]
+_EMPTY, _USED, _DELETED = 0, 1, 2
+
+
+class SharedMemorySessionStore(SessionStore):
+    """
+    Fixed-capacity open-addressing hash table of sessions in shared memory,
+    so several worker processes on one host see the same session state.
+    Slot allocation and removal take an flock on a lock file; reads and
+    writes of an existing slot do not, because Socket.IO keeps each sid on
+    one worker. Each process caches sid -> slot to skip probing, and checks
+    that the slot still holds the sid before using it.
+
+    The header counts attached processes. Each one detaches when it exits,
+    and the last one out unlinks the segment. No worker can remove it while
+    others still use it, and a later worker cannot end up with a fresh copy
+    under the same name. POSIX only (flock).
+    """
+    def __init__(self, name, capacity=4096, timeout=10.0):
+        if fcntl is None:
+            raise RuntimeError("The shared memory session store needs POSIX file locks (fcntl)")
+        self.name = name
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{name}.sessions.lock")
+        self.slots = {}  # sid -> slot index (this process only)
+        self.shm = self._open(capacity, timeout)
+        magic, version, self.capacity, _, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.shm.close()
+            raise ValueError(f"Segment {name} is not a version {_VERSION} session store")
+        with self._locked():
+            self._add_attached(+1)
+        self.attached = True
+        atexit.register(self.close)
+
+    def _open(self, capacity, timeout):
+        """Attach to the segment, or create it; waits until its creator marked it ready."""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                shm = attach_shared_memory(self.name)
+            except FileNotFoundError:
+                shm = None
+            except ValueError:
+                # Attached between the creator's shm_open and ftruncate: not sized yet
+                time.sleep(0.01)
+                continue
+            if shm is None:
+                try:
+                    shm = shared_memory.SharedMemory(
+                        name=self.name, create=True, size=_HEADER.size + capacity * _SLOT.size)
+                except FileExistsError:
+                    continue
+                # New segments are zero-filled, i.e. every slot is _EMPTY; ready goes last
+                _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, 0, 0)
+                _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, 1, 0)
+                # Lifetime follows the attach count, not this process's resource tracker
+                _untrack(shm)
+                return shm
+
+            while not _HEADER.unpack_from(shm.buf, 0)[3]:
+                if time.time() > deadline:
+                    # The creator died before finishing: replace the segment
+                    print(f"⚠ Session store {self.name} was never completed; recreating it")
+                    with self._locked():
+                        if not _HEADER.unpack_from(shm.buf, 0)[3]:
+                            _unlink_quietly(shm)
+                    shm.close()
+                    shm = None
+                    deadline = time.time() + timeout
+                    break
+                time.sleep(0.01)
+            if shm is not None:
+                return shm
+
+    def _add_attached(self, delta):
+        """Change the attach count (caller holds the lock); returns the new count."""
+        magic, version, capacity, ready, attached = _HEADER.unpack_from(self.shm.buf, 0)
+        attached = max(0, attached + delta)
+        _HEADER.pack_into(self.shm.buf, 0, magic, version, capacity, ready, attached)
+        return attached
+
+    def _offset(self, index):
+        return _HEADER.size + index * _SLOT.size
+
+    def _key(self, sid):
+        key = sid.encode()
+        if len(key) > 36:
+            raise ValueError(f"Session id too long for shared store: {sid!r}")
+        return key
+
+    def _find(self, key):
+        """Slot index holding key, or None."""
+        start = zlib.crc32(key) % self.capacity
+        for step in range(self.capacity):
+            index = (start + step) % self.capacity
+            status, slot_key = _SLOT.unpack_from(self.shm.buf, self._offset(index))[:2]
+            if status == _EMPTY:
+                return None
+            if status == _USED and slot_key.rstrip(b'\0') == key:
+                return index
+        return None
+
+    def _locked(self):
+        lock = open(self.lock_path, 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _write(self, index, status, key, state):
+        values = [getattr(state, field) for field in SessionState.FIELDS]
+        for i in _NULLABLE:
+            if values[i] is None:
+                values[i] = math.nan
+        _SLOT.pack_into(self.shm.buf, self._offset(index), status, key, *values)
+
+    def create(self, sid):
+        key = self._key(sid)
+        state = SessionState()
+        with self._locked():
+            index = self._find(key)
+            if index is None:
+                start = zlib.crc32(key) % self.capacity
+                for step in range(self.capacity):
+                    candidate = (start + step) % self.capacity
+                    status = _SLOT.unpack_from(self.shm.buf, self._offset(candidate))[0]
+                    if status != _USED:
+                        index = candidate
+                        break
+                else:
+                    raise RuntimeError(f"Session store {self.name} is full ({self.capacity} sessions)")
+            self._write(index, _USED, key, state)
+        self.slots[sid] = index
+        return state
+
+    def _index(self, sid, key):
+        """
+        Slot index holding key, or None. The cached index is trusted only
+        while the slot still holds key: another process may have deleted
+        the session and create() given the slot to a new one.
+        """
+        index = self.slots.get(sid)
+        if index is not None:
+            status, slot_key = _SLOT.unpack_from(self.shm.buf, self._offset(index))[:2]
+            if status == _USED and slot_key.rstrip(b'\0') == key:
+                return index
+            self.slots.pop(sid, None)
+        index = self._find(key)
+        if index is not None:
+            self.slots[sid] = index
+        return index
+
+    def get(self, sid):
+        key = self._key(sid)
+        index = self._index(sid, key)
+        if index is None:
+            return None
+        status, slot_key, *values = _SLOT.unpack_from(self.shm.buf, self._offset(index))
+        if status != _USED or slot_key.rstrip(b'\0') != key:
+            # Deleted or reused since _index() looked
+            self.slots.pop(sid, None)
+            return None
+        for i in _NULLABLE:
+            if math.isnan(values[i]):
+                values[i] = None
+        return SessionState(*values)
+
+    def save(self, sid, state):
+        key = self._key(sid)
+        index = self._index(sid, key)
+        if index is None:
+            raise KeyError(sid)
+        self._write(index, _USED, key, state)
+
+    def delete(self, sid):
+        key = self._key(sid)
+        self.slots.pop(sid, None)
+        with self._locked():
+            index = self._find(key)
+            if index is not None:
+                # Tombstone keeps later probe chains intact
+                self._write(index, _DELETED, b'', SessionState())
+
+    def __len__(self):
+        used = 0
+        for index in range(self.capacity):
+            if _SLOT.unpack_from(self.shm.buf, self._offset(index))[0] == _USED:
+                used += 1
+        return used
+
+    def close(self):
+        """Detach; the last process attached unlinks the segment."""
+        if not self.attached:
+            return
+        self.attached = False
+        with self._locked():
+            if self._add_attached(-1) == 0:
+                _unlink_quietly(self.shm)
+        self.slots.clear()
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the segment now, whoever is attached (for launchers and tests)."""
+        _unlink_quietly(self.shm)
+
+
+def _untrack(shm):
+    """Keep the resource tracker from unlinking a segment this process created."""
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+def _unlink_quietly(shm):
+    # unlink() unregisters the name from the resource tracker; register it
+    # first, since this module keeps its segments untracked
+    from multiprocessing import resource_tracker
+    resource_tracker.register(shm._name, 'shared_memory')
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+def open_session_store(spec):
+    """
+    Build a store from a spec string: '' / 'local' for the in-process dict,
+    'shm:<name>' or 'shm:<name>:<capacity>' for the shared memory table.
+    """
+    if not spec or spec == 'local':
+        return LocalSessionStore()
+    kind, _, rest = spec.partition(':')
+    if kind == 'shm' and rest:
+        name, _, capacity = rest.partition(':')
+        return SharedMemorySessionStore(name, int(capacity) if capacity else 4096)
+    raise ValueError(f"Unknown session store spec: {spec!r}")
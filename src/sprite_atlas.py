@@ -0,0 +1,260 @@
+# src/sprite_atlas.py
+import atexit
+import hashlib
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from src.utils import attach_shared_memory
+
+# magic, version, steps, height, width, working scale, ready flag, builder pid,
+# SHA-256 of the source PNG and build parameters
+_HEADER = struct.Struct('<4sIIIIfII32s')
+_MAGIC = b'ACSA'
+_VERSION = 2
+_DATA_OFFSET = 64  # keep frame data cache-line aligned
+
+
+def source_digest(path, steps, working_scale):
+    """SHA-256 of the PNG's bytes and the parameters its rotation block is built with."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(struct.pack('<If', steps, min(1.0, working_scale)))
+    return digest.digest()
+
+
+def _pid_alive(pid):
+    if pid == 0 or os.name == 'nt':
+        return True   # unknown: only the build timeout can tell
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AtlasRotations:
+    """
+    Read-only view over one asset's (steps, H, W, 4) rotation block.
+    Drop-in for the rotations dict / RotationSet: get() is an O(1) index.
+    """
+    __slots__ = ('frames', 'steps', 'scale')
+
+    def __init__(self, frames, scale):
+        self.frames = frames
+        self.steps = frames.shape[0]
+        self.scale = scale
+
+    def __len__(self):
+        return self.steps
+
+    def index(self, angle):
+        return int(round((angle % 360) * self.steps / 360.0)) % self.steps
+
+    def get(self, angle):
+        return self.frames[self.index(angle)]
+
+    def overlay_scale(self, scale):
+        return scale / self.scale
+
+    @property
+    def nbytes(self):
+        return self.frames.nbytes
+
+
+class SpriteAtlas:
+    """
+    Immutable registry of pre-rotated VFX assets shared between processes.
+    Each asset lives in one shared memory segment named '<prefix>_<asset>'
+    holding a contiguous (steps, H, W, 4) BGRA array. The first process to
+    open the atlas builds it; every other process attaches without copying.
+    The header records the source digest and the builder's pid, so a
+    segment from an edited PNG or a crashed builder is rebuilt instead of
+    being used or waited on.
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.segments = {}   # name -> SharedMemory
+        self.assets = {}     # name -> AtlasRotations
+        self.owned = []
+
+    @classmethod
+    def open(cls, prefix, specs, vfx=None, timeout=60.0):
+        """
+        specs: {name: (png_path, steps, working_scale)}
+        vfx: VFXEngine used to load PNGs when this process builds a segment.
+        """
+        atlas = cls(prefix)
+        for name, (path, steps, working_scale) in specs.items():
+            atlas._open_asset(name, path, steps, working_scale, vfx, timeout)
+        return atlas
+
+    def _segment_name(self, name):
+        return f"{self.prefix}_{name}"
+
+    def _open_asset(self, name, path, steps, working_scale, vfx, timeout):
+        """
+        Attach to the asset's segment, or build it. A segment left by an
+        older source PNG or different parameters (digest mismatch), or by a
+        builder that died or never finished within timeout, is unlinked and
+        rebuilt.
+        """
+        seg_name = self._segment_name(name)
+        digest = source_digest(path, steps, working_scale)
+        deadline = time.time() + timeout
+        while True:
+            shm = self._attach(seg_name, deadline)
+            if shm is None:
+                shm = self._create(seg_name, path, steps, working_scale, digest, vfx)
+                if shm is None:
+                    continue   # another worker created it first: attach to theirs
+                break
+            stale = self._wait_ready(shm, digest, deadline)
+            if stale is None:
+                break
+            print(f"⚠ Rebuilding sprite atlas segment {seg_name}: {stale}")
+            self._reclaim(shm, seg_name)
+            deadline = time.time() + timeout
+
+        self.segments[name] = shm
+        self.assets[name] = self._view(shm)
+
+    @staticmethod
+    def _attach(seg_name, deadline):
+        """
+        The existing segment, or None. A segment attached between its
+        creator's shm_open and ftruncate maps as empty; retry until it has
+        its size.
+        """
+        while True:
+            try:
+                shm = attach_shared_memory(seg_name)
+            except FileNotFoundError:
+                return None
+            except ValueError:
+                # "cannot mmap an empty file": the creator has not sized it yet
+                shm = None
+            if shm is not None and shm.size >= _DATA_OFFSET:
+                return shm
+            if shm is not None:
+                shm.close()
+            if time.time() > deadline:
+                raise TimeoutError(f"Sprite atlas segment {seg_name} was never sized")
+            time.sleep(0.01)
+
+    def _create(self, seg_name, path, steps, working_scale, digest, vfx):
+        if vfx is None:
+            from src.vfx_engine import VFXEngine
+            vfx = VFXEngine()
+        png = vfx.load_png(path)
+        scale = min(1.0, working_scale)
+        if scale < 1.0:
+            h, w = png.shape[:2]
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            png = cv2.resize(png, size, interpolation=cv2.INTER_AREA)
+        h, w = png.shape[:2]
+        try:
+            shm = shared_memory.SharedMemory(
+                name=seg_name, create=True, size=_DATA_OFFSET + steps * h * w * 4)
+        except FileExistsError:
+            return None
+        self._build(shm, png, steps, scale, digest)
+        self.owned.append(shm)
+        if len(self.owned) == 1:
+            atexit.register(self.unlink)
+        return shm
+
+    @staticmethod
+    def _build(shm, png, steps, scale, digest):
+        h, w = png.shape[:2]
+        pid = os.getpid()
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, steps, h, w, scale, 0, pid, digest)
+        frames = np.ndarray((steps, h, w, 4), dtype=np.uint8, buffer=shm.buf, offset=_DATA_OFFSET)
+        angle_step = 360.0 / steps
+        for i in range(steps):
+            M = cv2.getRotationMatrix2D((w//2, h//2), i * angle_step, 1.0)
+            # Rotate straight into the shared block, no intermediate copy
+            cv2.warpAffine(
+                png, M, (w, h), dst=frames[i],
+                flags=cv2.INTER_LINEAR,
+                borderMode=cv2.BORDER_CONSTANT,
+                borderValue=(0, 0, 0, 0)
+            )
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, steps, h, w, scale, 1, pid, digest)
+
+    @staticmethod
+    def _wait_ready(shm, digest, deadline):
+        """Wait for the builder. Returns None when usable, else why the segment is stale."""
+        while True:
+            magic, version, steps, h, w, scale, ready, pid, built_from = _HEADER.unpack_from(shm.buf, 0)
+            if magic not in (_MAGIC, bytes(4)):
+                return "not a sprite atlas segment"
+            if magic == _MAGIC and (version != _VERSION or built_from != digest):
+                return "built from another source or version"
+            if ready:
+                if _DATA_OFFSET + steps * h * w * 4 > shm.size:
+                    return "truncated"
+                return None
+            if magic == _MAGIC and not _pid_alive(pid):
+                return f"builder {pid} exited before finishing"
+            if time.time() > deadline:
+                return "never completed"
+            time.sleep(0.05)
+
+    def _reclaim(self, shm, seg_name):
+        """
+        Unlink a stale segment, unless someone already replaced it (its
+        header changed since we judged it), so workers that reclaim at the
+        same time do not remove each other's rebuilds.
+        """
+        header = bytes(shm.buf[:_HEADER.size])
+        shm.close()
+        try:
+            current = attach_shared_memory(seg_name)
+        except (FileNotFoundError, ValueError):
+            return
+        try:
+            if bytes(current.buf[:_HEADER.size]) == header:
+                current.unlink()
+        except FileNotFoundError:
+            pass
+        finally:
+            current.close()
+
+    @staticmethod
+    def _view(shm):
+        magic, version, steps, h, w, scale, ready, pid, digest = _HEADER.unpack_from(shm.buf, 0)
+        frames = np.ndarray((steps, h, w, 4), dtype=np.uint8, buffer=shm.buf, offset=_DATA_OFFSET)
+        frames.flags.writeable = False
+        return AtlasRotations(frames, scale)
+
+    def rotations(self, name):
+        return self.assets[name]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.assets.values())
+
+    def close(self):
+        """Detach from all segments. Views from rotations() become invalid."""
+        self.assets.clear()
+        for shm in self.segments.values():
+            shm.close()
+        self.segments.clear()
+
+    def unlink(self):
+        """Remove the segments this process built. Attached workers keep their mappings."""
+        for shm in self.owned:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.owned = []
@@ -0,0 +1,163 @@
+# src/sprite_cache.py
+import math
+from collections import OrderedDict
+
+import cv2
+
+from src.vfx_engine import PreparedSprite
+
+
+def mip_levels(png, min_size=16):
+    """
+    INTER_AREA mip pyramid of a BGRA asset in PreparedSprite layout,
+    halving until the next level would be smaller than min_size.
+    """
+    levels = [PreparedSprite.from_bgra(png).data]
+    while min(levels[-1].shape[:2]) // 2 >= min_size:
+        h, w = levels[-1].shape[:2]
+        levels.append(cv2.resize(levels[-1], (w // 2, h // 2), interpolation=cv2.INTER_AREA))
+    return levels
+
+
+class SpriteCache:
+    """
+    LRU cache of ready-to-blend sprites keyed on (asset, rotation bucket,
+    quantized scale). Each asset keeps an INTER_AREA mip pyramid, so a miss
+    rotates the smallest level that still covers the target size and does
+    one small resize. Steady-state frames only hit the cache: no resizes,
+    no rotations.
+
+    Sprites whose scale changes every frame (a growing Spirit Bomb) would
+    miss on every frame at 3% steps, so they go through get_animated():
+    it caches rotations at coarse anchor scales (anim_ratio apart, never
+    above the source resolution) and leaves a small residual scale for the
+    compositor to apply.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, scale_ratio=1.03, min_mip_size=16,
+                 anim_ratio=1.5):
+        self.max_bytes = max_bytes
+        self.scale_ratio = scale_ratio    # geometric scale quantization (3% steps)
+        self.anim_ratio = anim_ratio      # anchor spacing for get_animated()
+        self.min_mip_size = min_mip_size
+        self.assets = {}                  # name -> (mip levels, rotation steps)
+        self.entries = OrderedDict()      # (name, bucket, q) -> PreparedSprite
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._log_ratio = math.log(scale_ratio)
+        self._log_anim = math.log(anim_ratio)
+
+    def add_asset(self, name, png=None, steps=72, levels=None):
+        """
+        Register a BGRA asset. steps sets the rotation quantization
+        (72 = one bucket every 5 degrees, same as pregenerate_rotations).
+        levels: a ready mip pyramid (from mip_levels() or an AssetBundle)
+        to use instead of building one from png.
+        """
+        if levels is None:
+            levels = mip_levels(png, self.min_mip_size)
+        self.assets[name] = (list(levels), steps)
+        # Drop stale entries if the asset was replaced
+        for key in [k for k in self.entries if k[0] == name]:
+            self.nbytes -= self.entries.pop(key).nbytes
+
+    def set_steps(self, steps, names=None):
+        """
+        Change the rotation quantization of names (default: every asset).
+        Their cached sprites are dropped, since bucket numbers change meaning.
+        """
+        for name in self.assets if names is None else names:
+            levels, old = self.assets[name]
+            if old == steps:
+                continue
+            self.assets[name] = (levels, steps)
+            for key in [k for k in self.entries if k[0] == name]:
+                self.nbytes -= self.entries.pop(key).nbytes
+
+    def quantize_scale(self, scale):
+        """Map scale to its bucket index and the scale that bucket renders at."""
+        q = int(round(math.log(max(scale, 1e-3)) / self._log_ratio))
+        return q, math.exp(q * self._log_ratio)
+
+    def get(self, name, angle, scale=1.0):
+        """
+        Get the sprite for asset name rotated to angle (degrees) and sized by
+        scale relative to the source PNG. Pass the result to overlay_png with
+        scale=1.0.
+        """
+        q, qscale = self.quantize_scale(scale)
+        return self._get(name, angle, q, qscale)
+
+    def get_animated(self, name, angle, scale):
+        """
+        Like get(), for a scale that keeps changing. Returns (sprite,
+        residual): draw sprite at scale=residual (overlay_png /
+        overlay_batch resize it). The sprite is the rotation at the
+        smallest anchor scale >= scale, or at the source size above 1.0,
+        so residual is in (1 / anim_ratio, 1] up to 1.0 and a plain
+        upscale beyond it.
+        """
+        n = math.ceil(math.log(max(scale, 1e-3)) / self._log_anim - 1e-9)
+        n = min(n, 0)
+        anchor = math.exp(n * self._log_anim)
+        # Anchors get their own keys, apart from get()'s fine buckets
+        return self._get(name, angle, ('anim', n), anchor), scale / anchor
+
+    def _get(self, name, angle, q, qscale):
+        levels, steps = self.assets[name]
+        bucket = int(round((angle % 360) * steps / 360.0)) % steps
+        key = (name, bucket, q)
+
+        sprite = self.entries.get(key)
+        if sprite is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = self._render(levels, bucket * 360.0 / steps, qscale)
+        self.entries[key] = sprite
+        self.nbytes += sprite.nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return sprite
+
+    def _render(self, levels, angle, scale):
+        h, w = levels[0].shape[:2]
+        tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+
+        # Smallest mip level that is still at least the target size
+        src = levels[0]
+        for level in levels[1:]:
+            if level.shape[1] < tw or level.shape[0] < th:
+                break
+            src = level
+
+        lh, lw = src.shape[:2]
+        M = cv2.getRotationMatrix2D((lw // 2, lh // 2), angle, 1.0)
+        rotated = cv2.warpAffine(
+            src, M, (lw, lh),
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0, 255)  # transparent in premultiplied form
+        )
+        if (lw, lh) != (tw, th):
+            interp = cv2.INTER_AREA if tw <= lw else cv2.INTER_LINEAR
+            rotated = cv2.resize(rotated, (tw, th), interpolation=interp)
+        return PreparedSprite(rotated)
+
+    @property
+    def resident_bytes(self):
+        """Mip pyramids plus cached sprites."""
+        pyramids = sum(level.nbytes for levels, _ in self.assets.values() for level in levels)
+        return pyramids + self.nbytes
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'resident_bytes': self.resident_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,121 @@
+# src/stage_timer.py
+import functools
+import time
+
+from src.pipeline import LatencyStats
+from src.utils import put_text
+
+
+class _Timing:
+    """One timed span: `with timers.stage(name):`."""
+    __slots__ = ('timers', 'name', 't0')
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timers.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoTiming:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMING = _NoTiming()
+
+
+class StageTimers:
+    """
+    Rolling per-stage latency histograms (p50/p95/p99 over the last
+    `window` samples of each stage). Stages appear in the order they are
+    first recorded. When disabled, stage() hands back a shared no-op, so
+    instrumented code costs one attribute check per span.
+
+    Each stage() call returns its own span object, so spans from several
+    threads or green threads can overlap, including spans of the same stage.
+    """
+    def __init__(self, enabled=True, window=600):
+        self.enabled = enabled
+        self.window = window
+        self.stats = {}    # stage -> LatencyStats
+        self.counts = {}   # stage -> samples ever recorded
+        self.totals = {}   # stage -> seconds ever recorded
+        self._hud_lines = []
+        self._hud_time = 0.0
+
+    def stage(self, name):
+        return _Timing(self, name) if self.enabled else _NO_TIMING
+
+    def add(self, name, seconds):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats(self.window)
+            self.counts[name] = 0
+            self.totals[name] = 0.0
+        stats.add(seconds)
+        self.counts[name] += 1
+        self.totals[name] += seconds
+
+    def wrap(self, name):
+        """Decorator timing every call of a function as stage `name`."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def percentiles(self):
+        """{stage: {50: ms, 95: ms, 99: ms}}"""
+        return {name: stats.percentiles() for name, stats in list(self.stats.items())}
+
+    def report(self):
+        """Fixed-width text table, one row per stage."""
+        lines = [f"{'stage':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'count':>9}"]
+        for name, p in self.percentiles().items():
+            lines.append(f"{name:<14} {p[50]:>8.2f} {p[95]:>8.2f} {p[99]:>8.2f} {self.counts[name]:>9}")
+        return "\n".join(lines)
+
+    def prometheus(self, prefix='animecast'):
+        """Prometheus text exposition: one summary metric, labelled by stage."""
+        metric = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {metric} Time spent per frame stage (rolling window of {self.window}).",
+                 f"# TYPE {metric} summary"]
+        for name, p in self.percentiles().items():
+            for q in (50, 95, 99):
+                lines.append(f'{metric}{{stage="{name}",quantile="{q / 100:g}"}} {p[q] / 1000.0:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {self.totals[name]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {self.counts[name]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(self.report() + "\n")
+
+    def draw_hud(self, frame, origin=(10, 90), refresh=0.5):
+        """
+        Draw p50/p95/p99 per stage onto frame. The text is recomputed at
+        most every `refresh` seconds; drawing stays cheap in between.
+        """
+        now = time.perf_counter()
+        if now - self._hud_time >= refresh:
+            self._hud_lines = [f"{name:<10} {p[50]:5.1f} {p[95]:5.1f} {p[99]:5.1f} ms"
+                               for name, p in self.percentiles().items()]
+            self._hud_time = now
+        x, y = origin
+        for i, line in enumerate(self._hud_lines):
+            put_text(frame, line, (x, y + i * 18), color=(0, 255, 0), scale=0.45, thickness=1)
+        return frame
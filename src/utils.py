@@ -1,11 +1,32 @@
 # src/utils.py
 import cv2
 import numpy as np
+from multiprocessing import resource_tracker, shared_memory
 
 def put_text(frame, text, pos=(10,30), color=(0,255,0), scale=0.7, thickness=2):
     cv2.putText(frame, text, pos, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
     return frame
 
+def detection_size(frame_w, frame_h, width):
+    """(width, height) for a detection frame of the given width, keeping aspect ratio."""
+    return width, max(1, int(round(frame_h * width / frame_w)))
+
+def attach_shared_memory(name):
+    """
+    Attach to an existing shared memory segment without letting this
+    process's resource tracker unlink it on exit.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
 def get_grid_position(x, y, w, h):
     row_h = h // 3
     col_w = w // 3
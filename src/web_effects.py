@@ -0,0 +1,163 @@
+# src/web_effects.py
+"""
+web_app.py's effects for the EffectRegistry. Gestures are computed for a
+whole batch of hands at once (HandFeatures); each frame is a WebFrame
+over its rows. Effect state lives in the client's SessionState, so any
+worker can continue a session, and render() returns the processed_frame
+payload.
+"""
+import numpy as np
+
+from src.effect_registry import Effect
+from src.gesture_logic import ONLY_INDEX, OPEN_PALM
+
+# Web gesture rules compare fingertips with their MCP joints
+# (index, middle, ring, pinky)
+WEB_TIPS = [8, 12, 16, 20]
+WEB_MCPS = [5, 9, 13, 17]
+
+
+def classify_hands(landmarks):
+    """Open palm / only-index-up for every hand in a (N, 21, 3) array."""
+    y = landmarks[:, :, 1]
+    tips_above = y[:, WEB_TIPS] < y[:, WEB_MCPS]
+    tips_below = y[:, WEB_TIPS] > y[:, WEB_MCPS]
+    # At least 3 of 4 fingertips higher than their MCPs (thumb ignored)
+    open_palm = tips_above.sum(axis=1) >= 3
+    # Index tip above MCP, other fingers down
+    only_index = tips_above[:, 0] & tips_below[:, 1:].all(axis=1)
+    return open_palm, only_index
+
+
+class HandFeatures:
+    """Per-hand gesture inputs for a whole batch of hands, computed in one pass."""
+    __slots__ = ('masks', 'palm', 'tip')
+
+    def __init__(self, landmarks):
+        open_palm, only_index = classify_hands(landmarks)
+        # Same bits as gesture_logic.classify_all, so effects declare features alike
+        self.masks = open_palm * np.uint8(OPEN_PALM) | only_index * np.uint8(ONLY_INDEX)
+        # Palm center = (wrist + middle_mcp) / 2; tip = index fingertip
+        self.palm = (landmarks[:, 0, :2] + landmarks[:, 9, :2]) / 2
+        self.tip = landmarks[:, 8, :2]
+
+
+class WebFrame:
+    """One client frame: rows idx of a batch's HandFeatures."""
+    __slots__ = ('feats', 'idx', 'w', 'h', 'session', 'now', 'hand_count', 'spin')
+
+    def __init__(self, feats, idx, w, h, session, now):
+        self.feats = feats
+        self.idx = idx
+        self.w = w
+        self.h = h
+        self.session = session      # SessionState, advanced in place
+        self.now = now              # time.time()
+        self.hand_count = len(idx)
+        # Event-mode clients spin from effect_start and the spin rate, so the
+        # per-frame angles only advance for per-frame replies
+        self.spin = not session.events
+
+
+class Rasengan(Effect):
+    """Single open palm."""
+    name = 'rasengan'
+    hands = 1
+    features = OPEN_PALM
+
+    def __init__(self, priority=0, spin_step=15, scale=0.25):
+        self.priority = priority
+        self.spin_step = spin_step
+        self.scale = scale
+
+    def update(self, ctx, state):
+        i = ctx.idx[0]
+        if not ctx.feats.masks[i] & OPEN_PALM:
+            return None
+        if ctx.spin:
+            ctx.session.rasengan_angle = (ctx.session.rasengan_angle + self.spin_step) % 360
+        return int(ctx.feats.palm[i, 0] * ctx.w), int(ctx.feats.palm[i, 1] * ctx.h)
+
+    def render(self, ctx, state, phase):
+        cx, cy = phase
+        return {
+            'vfx_data': {
+                'type': 'rasengan',
+                'angle': ctx.session.rasengan_angle,
+                'position': {'x': cx, 'y': cy},
+                'scale': self.scale
+            },
+            'effect': 'Rasengan'
+        }
+
+
+class FreezaBeam(Effect):
+    """Only the index finger up."""
+    name = 'freeza'
+    hands = 1
+    features = ONLY_INDEX
+
+    def __init__(self, priority=1, spin_step=8, scale=0.3):
+        self.priority = priority
+        self.spin_step = spin_step
+        self.scale = scale
+
+    def update(self, ctx, state):
+        i = ctx.idx[0]
+        if not ctx.feats.masks[i] & ONLY_INDEX:
+            return None
+        if ctx.spin:
+            ctx.session.freeza_angle = (ctx.session.freeza_angle + self.spin_step) % 360
+        return int(ctx.feats.tip[i, 0] * ctx.w), int(ctx.feats.tip[i, 1] * ctx.h)
+
+    def render(self, ctx, state, phase):
+        cx, cy = phase
+        return {
+            'vfx_data': {
+                'type': 'freeza',
+                'angle': ctx.session.freeza_angle,
+                'position': {'x': cx, 'y': cy},
+                'scale': self.scale
+            },
+            'effect': 'Freeza Beam'
+        }
+
+
+class SpiritBomb(Effect):
+    """Both palms in the top third: charges for charge_time seconds."""
+    name = 'goku'
+    hands = 2
+
+    def __init__(self, priority=0, charge_time=10.0, spin_step=12, top=0.33):
+        self.priority = priority
+        self.charge_time = charge_time
+        self.spin_step = spin_step
+        self.top = top
+
+    def update(self, ctx, state):
+        p0x, p0y = ctx.feats.palm[ctx.idx[0]]
+        p1x, p1y = ctx.feats.palm[ctx.idx[1]]
+        if not (p0y < self.top and p1y < self.top):
+            return None
+
+        session = ctx.session
+        if session.charge_start is None:
+            session.charge_start = ctx.now
+        session.charge_level = min(1.0, (ctx.now - session.charge_start) / self.charge_time)
+        if ctx.spin:
+            session.goku_angle = (session.goku_angle + self.spin_step) % 360
+        return int(((p0x + p1x) / 2) * ctx.w), int(((p0y + p1y) / 2) * ctx.h)
+
+    def render(self, ctx, state, phase):
+        cx, cy = phase
+        charge_level = ctx.session.charge_level
+        return {
+            'vfx_data': {
+                'type': 'goku',
+                'angle': ctx.session.goku_angle,
+                'position': {'x': cx, 'y': cy},
+                'scale': 0.2 + (charge_level * 1.0),  # grows from 0.2 to 1.2
+                'charge_level': charge_level
+            },
+            'effect': 'Spirit Bomb'
+        }
@@ -0,0 +1,148 @@
+# src/wire_protocol.py
+"""
+Landmark wire formats between the browser clients and web_app.
+
+Protocol 1 (JSON): process_frame {hands: [[{x, y, z} x 21], ...], width, height, seq?}
+                   processed_frame {vfx_data: {...} | None, effect, seq?}
+Protocol 2 (binary, negotiated with 'hello' / 'welcome'):
+
+  process_frame_bin, little-endian:
+    u8 version (2) | u8 format | u8 hand count | u8 seq | u16 width | u16 height
+    then hands * 21 * 3 values (x, y, z per landmark):
+      FORMAT_U16: x, y quantized from [0, 1], z from [-1, 1], to 0..65535
+      FORMAT_F32: raw float32
+
+  processed_frame_bin, fixed 20 bytes:
+    u8 version | u8 effect code | u16 seq | i16 x | i16 y
+    | f32 angle | f32 scale | f32 charge level (NaN when not charging)
+
+seq is optional and echoed back in the reply, so a client can tell which
+frame a reply answers (frames superseded in the server queue get none).
+The browser pages leave it at 0 / unset; the load tester uses it.
+"""
+import json
+import math
+import struct
+
+import numpy as np
+
+PROTOCOL_JSON = 1
+PROTOCOL_BINARY = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_BINARY, PROTOCOL_JSON)
+
+FORMAT_U16 = 1
+FORMAT_F32 = 2
+
+FRAME_HEADER = struct.Struct('<BBBBHH')
+REPLY = struct.Struct('<BBHhhfff')
+
+# Effect codes in binary replies: (vfx type, effect label)
+EFFECTS = {
+    0: (None, None),
+    1: ('rasengan', 'Rasengan'),
+    2: ('freeza', 'Freeza Beam'),
+    3: ('goku', 'Spirit Bomb'),
+}
+EFFECT_CODES = {vfx_type: code for code, (vfx_type, _) in EFFECTS.items()}
+
+_U16_MAX = 65535.0
+
+
+def negotiate(offered):
+    """Highest protocol both sides speak, from the versions a client offers."""
+    for version in SUPPORTED_PROTOCOLS:
+        if version in (offered or ()):
+            return version
+    return PROTOCOL_JSON
+
+
+def hands_to_array(hands):
+    """
+    (N, 21, 3) float32 array from JSON hands (lists of {x, y, z} dicts).
+    Hands with fewer than 21 landmarks become NaN rows, so every gesture
+    comparison on them is False.
+    """
+    arr = np.full((len(hands), 21, 3), np.nan, dtype=np.float32)
+    for i, hand in enumerate(hands):
+        if len(hand) >= 21:
+            arr[i] = [(lm['x'], lm['y'], lm.get('z', 0.0)) for lm in hand[:21]]
+    return arr
+
+
+def encode_frame(landmarks, width, height, fmt=FORMAT_U16, seq=0):
+    """Binary process_frame_bin payload for a (N, 21, 3) landmark array."""
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    header = FRAME_HEADER.pack(PROTOCOL_BINARY, fmt, len(landmarks), seq & 0xFF, width, height)
+    if fmt == FORMAT_F32:
+        return header + landmarks.astype('<f4').tobytes()
+    q = landmarks.copy()
+    q[:, :, 2] = (q[:, :, 2] + 1.0) / 2.0
+    q = np.clip(q, 0.0, 1.0) * _U16_MAX
+    return header + np.rint(q).astype('<u2').tobytes()
+
+
+def decode_frame(payload):
+    """
+    Parse a process_frame_bin payload.
+    Returns (landmarks (N, 21, 3) float32, width, height).
+    """
+    version, fmt, n_hands, _, width, height = FRAME_HEADER.unpack_from(payload, 0)
+    if version != PROTOCOL_BINARY:
+        raise ValueError(f"Unsupported frame version {version}")
+    count = n_hands * 21 * 3
+    if fmt == FORMAT_F32:
+        values = np.frombuffer(payload, dtype='<f4', count=count, offset=FRAME_HEADER.size)
+        return values.reshape(n_hands, 21, 3), width, height
+    if fmt != FORMAT_U16:
+        raise ValueError(f"Unknown landmark format {fmt}")
+    values = np.frombuffer(payload, dtype='<u2', count=count, offset=FRAME_HEADER.size)
+    landmarks = values.reshape(n_hands, 21, 3) * np.float32(1.0 / _U16_MAX)
+    landmarks[:, :, 2] = landmarks[:, :, 2] * 2.0 - 1.0
+    return landmarks, width, height
+
+
+def frame_seq(payload):
+    """The seq byte of a process_frame_bin payload."""
+    return payload[3]
+
+
+def encode_reply(payload, seq=0):
+    """Fixed-layout binary form of a processed_frame payload dict."""
+    vfx = payload.get('vfx_data')
+    if not vfx:
+        return REPLY.pack(PROTOCOL_BINARY, 0, seq, 0, 0, 0.0, 0.0, math.nan)
+    charge = vfx.get('charge_level')
+    return REPLY.pack(
+        PROTOCOL_BINARY, EFFECT_CODES[vfx['type']], seq,
+        vfx['position']['x'], vfx['position']['y'],
+        vfx['angle'], vfx['scale'],
+        math.nan if charge is None else charge
+    )
+
+
+def decode_reply(reply):
+    """Inverse of encode_reply (used by benchmarks and load tools)."""
+    _, code, _, x, y, angle, scale, charge = REPLY.unpack(reply)
+    vfx_type, effect = EFFECTS[code]
+    if vfx_type is None:
+        return {'vfx_data': None, 'effect': None}
+    vfx = {'type': vfx_type, 'angle': angle, 'position': {'x': x, 'y': y}, 'scale': scale}
+    if not math.isnan(charge):
+        vfx['charge_level'] = charge
+    return {'vfx_data': vfx, 'effect': effect}
+
+
+def reply_seq(reply):
+    """The seq echoed in a processed_frame_bin reply."""
+    return REPLY.unpack_from(reply, 0)[2]
+
+
+def json_frame(landmarks, width, height):
+    """Protocol 1 process_frame dict for a (N, 21, 3) array, as the templates send it."""
+    hands = [[{'x': float(x), 'y': float(y), 'z': float(z)} for x, y, z in hand] for hand in landmarks]
+    return {'hands': hands, 'width': width, 'height': height}
+
+
+def json_size(payload):
+    """Bytes a JSON payload takes on the wire."""
+    return len(json.dumps(payload, separators=(',', ':')).encode())
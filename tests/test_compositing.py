@@ -0,0 +1,111 @@
+# tests/test_compositing.py
+"""
+The integer compositor against the float blend overlay_png used before
+(alpha / 255.0, result truncated to uint8): every channel must stay
+within 1 of it.
+"""
+import numpy as np
+import pytest
+
+from src.vfx_engine import PreparedSprite, VFXEngine, _div255
+
+
+def float_overlay(frame, png, center_xy):
+    """The original float-path overlay_png at scale 1.0."""
+    fh, fw = frame.shape[:2]
+    ph, pw = png.shape[:2]
+    x1 = int(center_xy[0] - pw // 2)
+    y1 = int(center_xy[1] - ph // 2)
+    x1o, y1o = max(0, x1), max(0, y1)
+    x2o, y2o = min(fw, x1 + pw), min(fh, y1 + ph)
+    if x1o >= x2o or y1o >= y2o:
+        return frame
+    fg = png[y1o - y1:y2o - y1, x1o - x1:x2o - x1]
+    a = fg[:, :, 3:4] / 255.0
+    roi = frame[y1o:y2o, x1o:x2o]
+    frame[y1o:y2o, x1o:x2o] = (a * fg[:, :, :3] + (1 - a) * roi).astype(np.uint8)
+    return frame
+
+
+def random_case(rng, h=120, w=160, ph=48, pw=64):
+    frame = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    png = rng.integers(0, 256, (ph, pw, 4), dtype=np.uint8)
+    # Include fully transparent and fully opaque pixels
+    png[:4, :, 3] = 0
+    png[-4:, :, 3] = 255
+    return frame, png
+
+
+CENTERS = [(80, 60), (0, 0), (159, 119), (10, 100), (-20, 60)]
+
+
+def test_div255_is_exact():
+    products = np.arange(255 * 255 + 1, dtype=np.uint16)
+    expected = np.floor(products / 255.0 + 0.5).astype(np.uint16)
+    np.testing.assert_array_equal(_div255(products.copy()), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("center", CENTERS)
+def test_overlay_png_matches_float_blend(seed, center):
+    rng = np.random.default_rng(seed)
+    frame, png = random_case(rng)
+    expected = float_overlay(frame.copy(), png, center)
+
+    vfx = VFXEngine()
+    raw = vfx.overlay_png(frame.copy(), png, center)
+    prepared = vfx.overlay_png(frame.copy(), PreparedSprite.from_bgra(png), center)
+
+    assert np.abs(raw.astype(np.int16) - expected).max() <= 1
+    np.testing.assert_array_equal(prepared, raw)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_overlay_batch_matches_overlay_png(seed):
+    rng = np.random.default_rng(seed)
+    frame, png = random_case(rng)
+    other = rng.integers(0, 256, (32, 32, 4), dtype=np.uint8)
+    sprite = PreparedSprite.from_bgra(png)
+
+    vfx = VFXEngine()
+    expected = frame.copy()
+    vfx.overlay_png(expected, sprite, (70, 50))
+    vfx.overlay_png(expected, other, (150, 110))   # overlaps the frame edge
+    vfx.overlay_png(expected, sprite, (90, 70))
+
+    batched = vfx.overlay_batch(frame.copy(), [
+        (sprite, (90, 70), 1.0, 1.0, 2),
+        (sprite, (70, 50), 1.0, 1.0, 0),
+        (other, (150, 110), 1.0, 1.0, 1),
+    ])
+    np.testing.assert_array_equal(batched, expected)
+
+
+@pytest.mark.parametrize("opacity", [0.25, 0.5, 0.8])
+def test_overlay_batch_opacity_matches_float_blend(opacity):
+    rng = np.random.default_rng(7)
+    frame, png = random_case(rng)
+    faded = png.copy()
+    faded[:, :, 3] = np.floor(png[:, :, 3] * opacity + 0.5).astype(np.uint8)
+    expected = float_overlay(frame.copy(), faded, (80, 60))
+
+    batched = VFXEngine().overlay_batch(frame.copy(), [(png, (80, 60), 1.0, opacity, 0)])
+    # Opacity rounds the premultiplied color once more than the float blend
+    assert np.abs(batched.astype(np.int16) - expected).max() <= 2
+
+
+def test_overlay_batch_disjoint_groups():
+    rng = np.random.default_rng(3)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    sprites = [rng.integers(0, 256, (40, 40, 4), dtype=np.uint8) for _ in range(4)]
+    # Two overlapping pairs at opposite corners, the far pair half clipped
+    placements = [(30, 30), (50, 45), (310, 230), (290, 220)]
+
+    vfx = VFXEngine()
+    expected = frame.copy()
+    for sprite, center in zip(sprites, placements):
+        vfx.overlay_png(expected, sprite, center)
+
+    batched = vfx.overlay_batch(frame.copy(), [
+        (sprite, center, 1.0, 1.0, z) for z, (sprite, center) in enumerate(zip(sprites, placements))])
+    np.testing.assert_array_equal(batched, expected)
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+
+from src.frame_ring import FrameRing
+from src.pipeline import CapturePipeline
+
+
+class CountingCapture:
+    """cv2.VideoCapture stand-in: every frame is filled with its frame number (mod 256)."""
+    def __init__(self, width=64, height=48, period=0.0):
+        self.shape = (height, width, 3)
+        self.period = period
+        self.count = 0
+
+    def read(self, image=None):
+        if self.period:
+            time.sleep(self.period)
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, dtype=np.uint8)
+        self.count += 1
+        image.fill(self.count % 256)
+        return True, image
+
+    def set(self, *args):
+        return True
+
+
+class Results:
+    multi_hand_landmarks = None
+
+
+class CheckingDetector:
+    """Fails the test (via errors) if its input changes while it is being processed."""
+    def __init__(self, hold=0.01):
+        self.hold = hold
+        self.errors = []
+
+    def process(self, rgb):
+        before = rgb.copy()
+        time.sleep(self.hold)
+        if not np.array_equal(before, rgb):
+            self.errors.append('detection input overwritten')
+        return Results()
+
+
+def test_held_slots_are_not_reused():
+    cap = CountingCapture()
+    ring = FrameRing(64, 48, detection_width=32, slots=3, mirror='none')
+    held = [ring.read(cap) for _ in range(3)]
+    assert all(slot is not None for slot in held)
+    assert len({id(slot) for slot in held}) == 3
+
+    # Every slot is in use: the frame is read and dropped
+    assert ring.read(cap) is None
+    assert ring.dropped == 1
+    assert [int(slot.capture[0, 0, 0]) for slot in held] == [1, 2, 3]
+
+    ring.release(held[1])
+    slot = ring.read(cap)
+    assert slot is held[1]
+    assert int(slot.capture[0, 0, 0]) == 5
+
+
+def test_slot_is_free_only_after_every_consumer_releases():
+    cap = CountingCapture()
+    ring = FrameRing(64, 48, detection_width=32, slots=1, mirror='none')
+    slot = ring.read(cap)
+    ring.hold(slot)
+    ring.release(slot)
+    assert ring.read(cap) is None
+    ring.release(slot)
+    assert ring.read(cap) is slot
+
+
+def test_pipeline_frames_stay_intact_while_held():
+    cap = CountingCapture(period=0.001)
+    detector = CheckingDetector()
+    ring = FrameRing(64, 48, detection_width=32, slots=5)
+    pipeline = CapturePipeline(cap, detector, 32, ring=ring).start()
+    try:
+        shown = 0
+        while shown < 20:
+            item = pipeline.next_frame()
+            assert item is not None
+            slot, _ = item
+            before = slot.frame.copy()
+            time.sleep(0.01)    # render and display: several captures long
+            assert np.array_equal(before, slot.frame)
+            ring.release(slot)
+            shown += 1
+    finally:
+        pipeline.stop()
+    assert detector.errors == []
+    assert pipeline.detection.detections > 0
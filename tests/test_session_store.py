@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from src.session_store import SessionState, SharedMemorySessionStore, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="shared memory store needs fcntl")
+
+
+@pytest.fixture
+def stores():
+    # One slot, so a new session always reuses the slot of a deleted one
+    name = f"animecast_test_{os.getpid()}"
+    first = SharedMemorySessionStore(name, capacity=1)
+    second = SharedMemorySessionStore(name, capacity=1)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_cached_slot_reused_by_another_session(stores):
+    first, second = stores
+    first.create('alice')
+    first.save('alice', SessionState(rasengan_angle=10.0))
+    assert second.get('alice').rasengan_angle == 10.0   # second now caches alice's slot
+
+    first.delete('alice')
+    first.create('bob')
+    first.save('bob', SessionState(rasengan_angle=99.0))
+
+    assert second.get('alice') is None
+    with pytest.raises(KeyError):
+        second.save('alice', SessionState(rasengan_angle=1.0))
+    assert first.get('bob').rasengan_angle == 99.0
+    assert second.get('bob').rasengan_angle == 99.0